@@ -1,17 +1,27 @@
 from django.contrib import admin
-from .models import Query, QueryFeedback
+from .forms import DataSourceAdminForm
+from .models import DataSource, Query, QueryFeedback
+
+@admin.register(DataSource)
+class DataSourceAdmin(admin.ModelAdmin):
+    form = DataSourceAdminForm
+    list_display = ('id', 'name', 'host', 'dbname', 'is_active', 'updated_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'host', 'dbname')
+    readonly_fields = ('created_at', 'updated_at')
+
 
 @admin.register(Query)
 class QueryAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'natural_language', 'created_at')
-    list_filter = ('user', 'created_at')
+    list_display = ('id', 'user', 'data_source', 'natural_language', 'created_at')
+    list_filter = ('user', 'data_source', 'created_at')
     search_fields = ('natural_language', 'sql_query')
     readonly_fields = ('created_at',)
 
 
 @admin.register(QueryFeedback)
 class QueryFeedbackAdmin(admin.ModelAdmin):
-    list_display = ('id', 'query_user', 'rating', 'help_full', 'created_at')
-    list_filter = ('rating', 'help_full', 'created_at')
+    list_display = ('id', 'query_user', 'data_source', 'rating', 'help_full', 'created_at')
+    list_filter = ('rating', 'help_full', 'data_source', 'created_at')
     search_fields = ('comments',)
     readonly_fields = ('created_at',)
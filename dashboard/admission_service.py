@@ -0,0 +1,282 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import metrics
+
+# Priority classes, lower runs first
+INTERACTIVE = 0
+RERUN = 1
+EXPORT = 2
+
+WAIT_BUCKETS_MS = (10, 50, 100, 500, 1000, 5000, 10000)
+
+# Retry-After for work that cannot be admitted at all, e.g. under a rate limit of zero
+MAX_RETRY_AFTER_SECONDS = 3600
+
+
+class AdmissionRejected(Exception):
+    """Raised when work cannot be admitted; retry_after is in whole seconds"""
+
+    def __init__(self, message, retry_after, status=503):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(min(retry_after, MAX_RETRY_AFTER_SECONDS))))
+        self.status = status
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate              # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        # now can predate a bucket created after it was read
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, cost, now):
+        """Seconds until cost tokens are available, 0 when they are now"""
+        self._refill(now)
+        if self.tokens >= cost:
+            return 0.0
+        if self.rate <= 0:
+            return float('inf')
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost):
+        self.tokens -= cost
+
+    def refund(self, cost):
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+
+class _Gate:
+    """
+    Concurrency limit with a bounded priority wait queue. Work may take several
+    slots (cost). Released slots go straight to the waiters in priority order,
+    FIFO within a class; a waiter that does not fit yet holds back those behind it.
+    """
+
+    def __init__(self, name, concurrency, queue_size):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.active = 0
+        self.queued = 0
+        self.hold_seconds = 1.0       # moving average of slot hold time, for Retry-After
+        self._waiting = []            # heap of [priority, seq, state, cost]
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def _publish(self):
+        metrics.set_gauge(f'admission.{self.name}.active', self.active)
+        metrics.set_gauge(f'admission.{self.name}.queue_depth', self.queued)
+
+    def retry_after(self):
+        return self.hold_seconds * (self.queued + 1) / max(1, self.concurrency)
+
+    def _grant_waiting(self):
+        """Hand free slots to the waiters at the head of the queue; call with the lock held"""
+        granted = False
+        while self._waiting:
+            entry = self._waiting[0]
+            if entry[2] == 'cancelled':
+                heapq.heappop(self._waiting)
+                continue
+            if self.active + entry[3] > self.concurrency:
+                break
+            heapq.heappop(self._waiting)
+            entry[2] = 'granted'
+            self.active += entry[3]
+            self.queued -= 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+        self._publish()
+
+    def acquire(self, priority, timeout, cost=1):
+        """Wait for cost slots, at most the concurrency limit; returns the seconds waited"""
+        started = time.monotonic()
+        with self._cond:
+            if self.active + cost <= self.concurrency and not self.queued:
+                self.active += cost
+                self._publish()
+                return 0.0
+            if self.queued >= self.queue_size:
+                metrics.incr(f'admission.{self.name}.rejected.queue_full')
+                raise AdmissionRejected(f"The {self.name} queue is full, try again shortly", self.retry_after())
+
+            entry = [priority, next(self._sequence), 'waiting', cost]
+            heapq.heappush(self._waiting, entry)
+            self.queued += 1
+            self._publish()
+
+            deadline = started + timeout
+            while entry[2] == 'waiting':
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Left in the heap and dropped by _grant_waiting(), which may now admit those behind it
+                    entry[2] = 'cancelled'
+                    self.queued -= 1
+                    self._grant_waiting()
+                    metrics.incr(f'admission.{self.name}.rejected.timeout')
+                    raise AdmissionRejected(f"Timed out waiting for the {self.name} queue", self.retry_after())
+                self._cond.wait(remaining)
+
+        return time.monotonic() - started
+
+    def release(self, held_seconds, cost=1):
+        with self._cond:
+            self.hold_seconds = 0.8 * self.hold_seconds + 0.2 * held_seconds
+            self.active -= cost
+            self._grant_waiting()
+
+
+class Ticket:
+    """
+    An admitted unit of work holding cost slots of a gate. Release it once,
+    or use it as a context manager; further releases are ignored, from any thread.
+    """
+
+    def __init__(self, gate, cost=1):
+        self._gate = gate
+        self._cost = cost
+        self._admitted = time.monotonic()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._gate.release(time.monotonic() - self._admitted, self._cost)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class ReleasingIterator:
+    """Wraps a streaming response body so the ticket is released when the response closes"""
+
+    def __init__(self, iterable, ticket):
+        self._iterable = iterable
+        self._ticket = ticket
+
+    def __iter__(self):
+        try:
+            yield from self._iterable
+        finally:
+            self._ticket.release()
+
+    def close(self):
+        close = getattr(self._iterable, 'close', None)
+        if close is not None:
+            close()
+        self._ticket.release()
+
+
+class Scheduler:
+    """
+    Admission control in front of LLM calls and SQL execution.
+
+    LLM work is rate limited by a global and a per-user token bucket, and
+    rejected straight away when either is empty. Each resource has a
+    concurrency limit with a bounded wait queue; waiters are served by
+    priority class and give up after ADMISSION_QUEUE_TIMEOUT_SECONDS.
+
+    State is per process, so every limit is divided by ADMISSION_WORKERS to
+    keep the deployment as a whole within the configured totals. A user's
+    requests spread over the workers, so their quota holds on average rather
+    than exactly.
+    """
+
+    def __init__(self):
+        self._workers = max(1, settings.ADMISSION_WORKERS)
+        self._gates = {
+            'llm': _Gate('llm', max(1, settings.ADMISSION_LLM_CONCURRENCY // self._workers),
+                         settings.ADMISSION_QUEUE_SIZE),
+            'sql': _Gate('sql', max(1, settings.ADMISSION_SQL_CONCURRENCY // self._workers),
+                         settings.ADMISSION_QUEUE_SIZE),
+        }
+        self._global_bucket = self._bucket(settings.ADMISSION_LLM_GLOBAL_RATE, settings.ADMISSION_LLM_GLOBAL_BURST)
+        self._user_buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, per_minute, burst):
+        """Token bucket holding this process's share of a deployment-wide rate limit"""
+        return TokenBucket(per_minute / self._workers / 60, max(1, burst / self._workers))
+
+    def _check_rate(self, user_id, cost):
+        """Charge cost to the user's and the global bucket; returns a callable that refunds it"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._user_buckets.pop(user_id, None)
+            if bucket is None:
+                bucket = self._bucket(settings.ADMISSION_LLM_USER_RATE, settings.ADMISSION_LLM_USER_BURST)
+            self._user_buckets[user_id] = bucket
+            while len(self._user_buckets) > settings.ADMISSION_MAX_TRACKED_USERS:
+                self._user_buckets.popitem(last=False)
+
+            # Work costing more than a full bucket is charged the full bucket rather than never admitted
+            cost = min(cost, bucket.capacity, self._global_bucket.capacity)
+            user_wait = bucket.wait_time(cost, now)
+            global_wait = self._global_bucket.wait_time(cost, now)
+            if user_wait or global_wait:
+                metrics.incr('admission.llm.rejected.rate_limited')
+                scope = 'your' if user_wait >= global_wait else 'the global'
+                raise AdmissionRejected(f"Over {scope} question rate limit", max(user_wait, global_wait), status=429)
+            bucket.take(cost)
+            self._global_bucket.take(cost)
+
+        def refund():
+            with self._lock:
+                bucket.refund(cost)
+                self._global_bucket.refund(cost)
+        return refund
+
+    def admit(self, resource, user_id=None, priority=INTERACTIVE, cost=1):
+        """
+        Block until the resource has cost free slots and return a Ticket, or
+        raise AdmissionRejected. cost is the number of LLM calls or concurrent
+        statements the work makes; for LLM work it is also charged to the
+        rate limits.
+        """
+        if not settings.ADMISSION_ENABLED:
+            return Ticket(_NO_GATE)
+        refund = self._check_rate(user_id, cost) if resource == 'llm' else None
+
+        gate = self._gates[resource]
+        # Work wider than the limit takes every slot rather than waiting forever
+        slots = max(1, min(cost, gate.concurrency))
+        try:
+            waited = gate.acquire(priority, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS, slots)
+        except AdmissionRejected:
+            # Work that never ran does not count against the rate limits
+            if refund is not None:
+                refund()
+            raise
+        metrics.incr(f'admission.{resource}.admitted')
+        metrics.observe(f'admission.{resource}.wait_ms', waited * 1000, WAIT_BUCKETS_MS)
+        return Ticket(gate, slots)
+
+
+class _NoGate:
+    def release(self, held_seconds, cost=1):
+        pass
+
+
+_NO_GATE = _NoGate()
+
+scheduler = Scheduler()
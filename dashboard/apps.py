@@ -2,4 +2,12 @@ from django.apps import AppConfig
 
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'dashboard'
\ No newline at end of file
+    name = 'dashboard'
+
+    def ready(self):
+        from django.conf import settings
+
+        # Heavy dependencies load lazily; workers that prefer paying the cost at boot opt in here
+        if settings.PRELOAD_SERVICES:
+            from .startup import preload
+            preload()
\ No newline at end of file
@@ -1,26 +1,124 @@
-import pandas as pd
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError
+import threading
+import time
+from collections import OrderedDict
+
 from django.conf import settings
 
+from .value_index_service import ValueIndex
+
 class DatabaseService:
-    def __init__(self):
-        self.conn_params = {
-            'dbname': settings.DATABASES['default']['NAME'],
-            'user': settings.DATABASES['default']['USER'],
-            'password': settings.DATABASES['default']['PASSWORD'],
-            'host': settings.DATABASES['default']['HOST'],
-            'port': settings.DATABASES['default']['PORT'],
-        }
-
-        # SQLAlchemy connection string for PostgreSQL
-        self.db_url = f"postgresql+psycopg2://{self.conn_params['user']}:{self.conn_params['password']}@{self.conn_params['host']}:{self.conn_params['port']}/{self.conn_params['dbname']}"
-        self.engine = create_engine(self.db_url)
+    def __init__(self, data_source=None):
+        self.data_source = data_source
+
+        if data_source is None:
+            self.conn_params = {
+                'dbname': settings.DATABASES['default']['NAME'],
+                'user': settings.DATABASES['default']['USER'],
+                'password': settings.DATABASES['default']['PASSWORD'],
+                'host': settings.DATABASES['default']['HOST'],
+                'port': settings.DATABASES['default']['PORT'],
+            }
+        else:
+            self.conn_params = {
+                'dbname': data_source.dbname,
+                'user': data_source.user,
+                'password': data_source.password,
+                'host': data_source.host,
+                'port': data_source.port,
+            }
+
+        # SQLAlchemy URL for PostgreSQL; built with URL.create so credentials containing
+        # characters such as '@' or '%' are escaped
+        from sqlalchemy.engine import URL
+        self.db_url = URL.create(
+            drivername='postgresql+psycopg2',
+            username=self.conn_params['user'],
+            password=self.conn_params['password'],
+            host=self.conn_params['host'],
+            port=int(self.conn_params['port']) if self.conn_params['port'] else None,
+            database=self.conn_params['dbname'],
+        )
+        self._engine = None
+        self._released = False
+        self._schema = None
+        self._value_index = None
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        """
+        Connection pool for this source, created on first use. Once the registry
+        has released this service, a request still holding it borrows the pool of
+        the service now registered for the source instead of creating one that
+        nothing would release.
+        """
+        if self._released:
+            return get_database_service(self.data_source).engine
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    from sqlalchemy import create_engine
+                    self._engine = create_engine(
+                        self.db_url,
+                        pool_size=settings.DATA_SOURCE_POOL_SIZE,
+                        max_overflow=settings.DATA_SOURCE_MAX_OVERFLOW,
+                        pool_pre_ping=True,
+                    )
+        return self._engine
+
+    def release(self):
+        """
+        Close pooled connections and drop the cached schema snapshot
+        """
+        with self._lock:
+            self._released = True
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+            self._schema = None
+            self._value_index = None
+
+    def get_schema(self):
+        """
+        Cached (schema_info, schema_str) snapshot; introspected once per source
+        """
+        if self._schema is None:
+            schema_info, schema_str = self.get_schema_info()
+            if schema_info:
+                self._schema = (schema_info, schema_str)
+            return schema_info, schema_str
+        return self._schema
+
+    def get_value_index(self, wait=False):
+        """
+        Value index over this source's low-cardinality text columns, or None when
+        disabled. It is built and refreshed in the background unless wait is set.
+        """
+        if not settings.VALUE_INDEX_ENABLED:
+            return None
+        if self._value_index is None:
+            with self._lock:
+                if self._value_index is None:
+                    self._value_index = ValueIndex(self)
+        return self._value_index.refresh_if_stale(wait)
+
+    def get_prompt_context(self):
+        """
+        Schema text for the LLM prompt. None for the default database, which
+        uses the built-in schema in LLMService.
+        """
+        if self.data_source is None:
+            return None
+        if self.data_source.prompt_context:
+            return self.data_source.prompt_context
+        return self.get_schema()[1]
 
     def get_schema_info(self):
         """
         Extract schema information from the database
         """
+        from sqlalchemy import text
+
         schema_info = []
 
         try:
@@ -93,12 +191,40 @@ class DatabaseService:
             print(f"Error getting schema info: {e}")
             return [], "Error retrieving schema information"
 
-    def execute_query(self, sql_query):
+    def execute_query(self, sql_query, timeout=None, on_backend=None):
         """
         Execute an SQL query and return the results
+
+        timeout is a statement timeout in seconds. on_backend is called with the
+        backend pid before the query runs, so another thread can cancel it, and
+        with None once it finishes, before the connection returns to the pool.
+
+        With PREPARED_STATEMENTS_ENABLED the query runs as a prepared statement
+        of its parameterized shape, cached on the pooled connection.
         """
+        import pandas as pd
+
+        if settings.PREPARED_STATEMENTS_ENABLED:
+            from .prepared_service import read_sql_prepared as read_sql
+        else:
+            read_sql = pd.read_sql_query
+
         try:
-            df = pd.read_sql_query(sql_query, self.engine)
+            if timeout is None and on_backend is None and not settings.PREPARED_STATEMENTS_ENABLED:
+                df = pd.read_sql_query(sql_query, self.engine)
+            else:
+                with self.engine.connect() as conn:
+                    if timeout is not None:
+                        # SET LOCAL only lasts for this transaction, so the pooled connection is unaffected
+                        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout * 1000)}")
+                    if on_backend is None:
+                        df = read_sql(sql_query, conn)
+                    else:
+                        on_backend(conn.exec_driver_sql("SELECT pg_backend_pid()").scalar())
+                        try:
+                            df = read_sql(sql_query, conn)
+                        finally:
+                            on_backend(None)
             return {
                 'success': True,
                 'data': df.to_dict(orient='records'),
@@ -110,12 +236,107 @@ class DatabaseService:
                 'error': str(e)
             }
 
+    def cancel_backend(self, pid):
+        """
+        Cancel the statement running on another backend of this database
+        """
+        from sqlalchemy.exc import SQLAlchemyError
+
+        try:
+            with self.engine.connect() as conn:
+                return bool(conn.exec_driver_sql(f"SELECT pg_cancel_backend({int(pid)})").scalar())
+        except SQLAlchemyError as e:
+            print(f"Error cancelling backend {pid}: {e}")
+            return False
+
+    def iter_batches(self, sql_query, batch_size=None):
+        """
+        Execute a query on a server-side cursor and yield the results in batches.
+
+        Each item is a (columns, column_types, rows) tuple where column_types are
+        (type OID, precision, scale) from the cursor description. At least one
+        batch is always yielded so callers can see the columns of an empty result.
+        """
+        batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).exec_driver_sql(sql_query)
+            description = result.cursor.description or []
+            columns = [col[0] for col in description]
+            column_types = [(col[1], col[4], col[5]) for col in description]
+
+            rows = result.fetchmany(batch_size)
+            yield columns, column_types, rows
+            while rows:
+                rows = result.fetchmany(batch_size)
+                if rows:
+                    yield columns, column_types, rows
+
     def get_csv(self, sql_query):
         """
         Execute query and return results as CSV
         """
+        import pandas as pd
+
         try:
             df = pd.read_sql_query(sql_query, self.engine)
             return df.to_csv(index=False)
         except Exception as e:
             return f"Error: {str(e)}"
+
+
+
+class DataSourceRegistry:
+    """
+    Keeps one DatabaseService per data source so each has its own connection
+    pool and schema snapshot. Sources idle for longer than
+    DATA_SOURCE_IDLE_SECONDS, or beyond the DATA_SOURCE_MAX_ACTIVE most recently
+    used, release their pools.
+    """
+
+    def __init__(self):
+        self._services = OrderedDict()  # key -> (service, version, last_used)
+        self._lock = threading.Lock()
+
+    def get(self, data_source=None):
+        key = data_source.pk if data_source is not None else None
+        version = data_source.updated_at if data_source is not None else None
+        now = time.monotonic()
+        released = []
+
+        with self._lock:
+            entry = self._services.pop(key, None)
+            if entry is not None and entry[1] != version:
+                # Connection settings changed since the service was built
+                released.append(entry[0])
+                entry = None
+            service = entry[0] if entry is not None else DatabaseService(data_source)
+            self._services[key] = (service, version, now)
+
+            idle_cutoff = now - settings.DATA_SOURCE_IDLE_SECONDS
+            for other_key, (other, _, last_used) in list(self._services.items()):
+                if other_key != key and last_used < idle_cutoff:
+                    released.append(self._services.pop(other_key)[0])
+            while len(self._services) > settings.DATA_SOURCE_MAX_ACTIVE:
+                released.append(self._services.popitem(last=False)[1][0])
+
+        for other in released:
+            other.release()
+        return service
+
+    def release_all(self):
+        with self._lock:
+            services = [entry[0] for entry in self._services.values()]
+            self._services.clear()
+        for service in services:
+            service.release()
+
+
+registry = DataSourceRegistry()
+
+
+def get_database_service(data_source=None):
+    """
+    Shared DatabaseService for a data source, or the default database when None
+    """
+    return registry.get(data_source)
@@ -0,0 +1,324 @@
+import csv
+import io
+import json
+from decimal import Decimal
+from functools import lru_cache
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.duration import duration_iso_string
+
+# format name -> (content type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'json': ('application/json', 'json'),
+}
+
+# Accept header media types that map onto an export format
+ACCEPT_TYPES = {
+    'text/csv': 'csv',
+    'application/vnd.apache.arrow.stream': 'arrow',
+    'application/vnd.apache.arrow.file': 'arrow',
+    'application/vnd.apache.parquet': 'parquet',
+    'application/x-parquet': 'parquet',
+    'application/json': 'json',
+}
+
+# PostgreSQL json and jsonb; psycopg2 returns them parsed
+JSON_TYPES = {114, 3802}
+
+# PostgreSQL array type OIDs -> element type OIDs
+ARRAY_ELEMENT_TYPES = {
+    1000: 16, 1001: 17, 1005: 21, 1007: 23, 1016: 20, 1028: 26, 1021: 700, 1022: 701, 1231: 1700,
+    1182: 1082, 1183: 1083, 1115: 1114, 1185: 1184, 1187: 1186, 1009: 25, 1015: 1043, 1014: 1042,
+    2951: 2950, 199: 114, 3807: 3802,
+}
+
+# Largest NUMERIC precision exported as an Arrow decimal
+MAX_DECIMAL_PRECISION = 38
+
+
+@lru_cache(maxsize=None)
+def pg_arrow_types():
+    """
+    PostgreSQL type OIDs -> Arrow types. Anything not listed (text, enums, uuid, ...)
+    is exported as a string column; json and jsonb as JSON text.
+    """
+    import pyarrow as pa
+
+    return {
+        16: pa.bool_(),
+        17: pa.binary(),
+        20: pa.int64(),
+        21: pa.int16(),
+        23: pa.int32(),
+        26: pa.int64(),
+        700: pa.float32(),
+        701: pa.float64(),
+        # NUMERIC without a declared precision (e.g. AVG results); see arrow_type()
+        1700: pa.float64(),
+        1082: pa.date32(),
+        1083: pa.time64('us'),
+        1114: pa.timestamp('us'),
+        1184: pa.timestamp('us', tz='UTC'),
+        1186: pa.duration('us'),
+    }
+
+
+def arrow_type(type_code, precision=None, scale=None):
+    """
+    Arrow type for a result column. NUMERIC(p, s) with p up to 38 is exact as
+    decimal128(p, s); NUMERIC without a usable precision is a float64, which
+    rounds values past about 15 significant digits. Arrays are one-dimensional
+    lists of their element type.
+    """
+    import pyarrow as pa
+
+    if type_code in ARRAY_ELEMENT_TYPES:
+        return pa.list_(arrow_type(ARRAY_ELEMENT_TYPES[type_code]))
+    if type_code == 1700 and precision and scale is not None and 0 <= scale <= precision <= MAX_DECIMAL_PRECISION:
+        return pa.decimal128(precision, scale)
+    return pg_arrow_types().get(type_code, pa.string())
+
+
+class ExportJSONEncoder(DjangoJSONEncoder):
+    """Decimals as JSON numbers and bytea as PostgreSQL hex text"""
+
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return float(o)
+        if isinstance(o, (bytes, memoryview)):
+            return _bytea_text(o)
+        return super().default(o)
+
+
+def _json_text(value):
+    return json.dumps(value, cls=ExportJSONEncoder)
+
+
+def _bytea_text(value):
+    return '\\x' + bytes(value).hex()
+
+
+def _csv_formatter(type_code):
+    """Function writing a value of the column as CSV text, or None for str()"""
+    if type_code in JSON_TYPES or type_code in ARRAY_ELEMENT_TYPES:
+        return _json_text
+    if type_code == 17:
+        return _bytea_text
+    if type_code == 1186:
+        return duration_iso_string
+    return None
+
+
+def _is_json(type_code):
+    return type_code in JSON_TYPES or ARRAY_ELEMENT_TYPES.get(type_code) in JSON_TYPES
+
+
+def negotiate_format(fmt=None, accept=None):
+    """
+    Pick an export format from an explicit URL format or the Accept header
+    """
+    if fmt:
+        fmt = fmt.lower()
+        return fmt if fmt in EXPORT_FORMATS else None
+
+    if not accept:
+        return 'csv'
+
+    # Order the media ranges by their q value, keeping header order for ties
+    ranges = []
+    for position, item in enumerate(accept.split(',')):
+        parts = [p.strip() for p in item.split(';')]
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        ranges.append((-quality, position, parts[0].lower()))
+
+    for quality, _, media_type in sorted(ranges):
+        if quality == 0:
+            continue
+        if media_type in ACCEPT_TYPES:
+            return ACCEPT_TYPES[media_type]
+        if media_type in ('*/*', 'text/*'):
+            return 'csv'
+    return None
+
+
+def arrow_schema(columns, column_types):
+    """
+    Build an Arrow schema from the cursor description
+    """
+    import pyarrow as pa
+
+    return pa.schema([
+        pa.field(name, arrow_type(*column_type))
+        for name, column_type in zip(columns, column_types)
+    ])
+
+
+def _converter(type_code, field_type):
+    """Function turning a cursor value of the column into one Arrow accepts, or None when it already is"""
+    import pyarrow as pa
+
+    if type_code in ARRAY_ELEMENT_TYPES:
+        convert = _converter(ARRAY_ELEMENT_TYPES[type_code], field_type.value_type)
+        if convert is None:
+            return None
+        return lambda values: [None if value is None else convert(value) for value in values]
+    if type_code in JSON_TYPES:
+        return _json_text
+    if pa.types.is_string(field_type):
+        return str
+    if pa.types.is_floating(field_type):
+        return float
+    if pa.types.is_binary(field_type):
+        return bytes
+    return None
+
+
+def to_record_batch(schema, column_types, rows):
+    """
+    Convert a batch of cursor rows into an Arrow record batch
+    """
+    import pyarrow as pa
+
+    arrays = []
+    for index, (field, column_type) in enumerate(zip(schema, column_types)):
+        values = [row[index] for row in rows]
+        convert = _converter(column_type[0], field.type)
+        if convert is not None:
+            values = [None if value is None else convert(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for index, (columns, column_types, rows) in enumerate(batches):
+        if index == 0:
+            writer.writerow(columns)
+            # e.g. json and arrays as JSON text rather than Python reprs
+            formatters = [(i, _csv_formatter(column_type[0])) for i, column_type in enumerate(column_types)]
+            formatters = [(i, formatter) for i, formatter in formatters if formatter is not None]
+        if formatters:
+            rows = [list(row) for row in rows]
+            for row in rows:
+                for i, formatter in formatters:
+                    if row[i] is not None:
+                        row[i] = formatter(row[i])
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _arrow_chunks(batches):
+    import pyarrow as pa
+
+    sink = _ChunkSink()
+    writer = None
+    for columns, column_types, rows in batches:
+        if writer is None:
+            schema = arrow_schema(columns, column_types)
+            writer = pa.ipc.new_stream(sink, schema)
+        if rows:
+            writer.write_batch(to_record_batch(schema, column_types, rows))
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def _parquet_chunks(batches):
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    for columns, column_types, rows in batches:
+        if writer is None:
+            schema = arrow_schema(columns, column_types)
+            writer = pq.ParquetWriter(sink, schema)
+        if rows:
+            # Each cursor batch becomes its own row group
+            writer.write_batch(to_record_batch(schema, column_types, rows))
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def _json_chunks(batches):
+    """
+    Columnar JSON: {"columns": [...], "batches": [{"column": [values...]}, ...]}
+
+    Values go through the same Arrow types as the Arrow and Parquet exports,
+    so e.g. NUMERIC columns are numbers rather than strings (decimals become
+    JSON floats). json and jsonb values are nested as they are, bytea is hex text.
+    """
+    encoder = ExportJSONEncoder()
+    for index, (columns, column_types, rows) in enumerate(batches):
+        if index == 0:
+            schema = arrow_schema(columns, column_types)
+            yield ('{"columns": %s, "batches": [' % encoder.encode(columns)).encode('utf-8')
+        else:
+            yield b', '
+        record_batch = to_record_batch(schema, column_types, rows)
+        batch = {}
+        for i, name in enumerate(columns):
+            if _is_json(column_types[i][0]):
+                batch[name] = [row[i] for row in rows]
+            else:
+                batch[name] = record_batch.column(i).to_pylist()
+        yield encoder.encode(batch).encode('utf-8')
+    yield b']}'
+
+
+ENCODERS = {
+    'csv': _csv_chunks,
+    'arrow': _arrow_chunks,
+    'parquet': _parquet_chunks,
+    'json': _json_chunks,
+}
+
+
+def stream_export(batches, fmt):
+    """
+    Encode cursor batches from DatabaseService.iter_batches into the given format,
+    yielding bytes as each batch is written
+    """
+    for chunk in ENCODERS[fmt](batches):
+        if chunk:
+            yield chunk
@@ -1,7 +1,29 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
+from .models import DataSource
+
+class DataSourceAdminForm(forms.ModelForm):
+    password = forms.CharField(
+        required=False,
+        widget=forms.PasswordInput(render_value=False),
+        help_text="Leave blank to keep the current password."
+    )
+
+    class Meta:
+        model = DataSource
+        fields = '__all__'
+
+    def clean_password(self):
+        # The stored password is never sent to the browser, so blank means unchanged
+        password = self.cleaned_data.get('password')
+        if not password and self.instance.pk:
+            return self.instance.password
+        return password
+
+
 class RegistrationForm(UserCreationForm):
     email = forms.EmailField(
         required=True,
@@ -33,6 +55,18 @@ class QueryForm(forms.Form):
         }),
         required=True
     )
+    data_source = forms.ModelChoiceField(
+        queryset=DataSource.objects.filter(is_active=True),
+        empty_label='Default database',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        required=False
+    )
+
+    speculative = forms.BooleanField(
+        initial=settings.SPECULATIVE_ENABLED,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        required=False
+    )
 
 class QueryFeedbackForm(forms.Form):
     RATING_CHOICES = [(1, '1'), (2, '2'), (3, '3'), (4, '4'), (5, '5')]
@@ -40,4 +74,5 @@ class QueryFeedbackForm(forms.Form):
     rating = forms.ChoiceField(choices=RATING_CHOICES, required=True)
     comments = forms.CharField(widget=forms.Textarea, required=False)
     query_sql = forms.CharField(widget=forms.Textarea, required=False)
-    nlp_given = forms.CharField(widget=forms.Textarea, required=False)
\ No newline at end of file
+    nlp_given = forms.CharField(widget=forms.Textarea, required=False)
+    data_source = forms.ModelChoiceField(queryset=DataSource.objects.all(), widget=forms.HiddenInput, required=False)
\ No newline at end of file
@@ -0,0 +1,383 @@
+import hashlib
+import json
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from .prepared_service import parameterize
+from .sql_utils import SQL_KEYWORDS, TOKEN_RE, table_aliases
+
+PREDICATE_CLAUSES = {'where', 'on', 'having'}
+CLAUSE_STARTS = {'select', 'from', 'join', 'where', 'on', 'having', 'group', 'order', 'limit', 'offset', 'using',
+                 'union', 'intersect', 'except', 'window'}
+EQUALITY_OPERATORS = {'=', 'in'}
+RANGE_OPERATORS = {'<', '>', '<=', '>=', 'between'}
+
+
+def _tokens(sql):
+    """Significant tokens as (kind, text, lower-cased name), with <=, >=, <> and != merged"""
+    tokens = []
+    for match in TOKEN_RE.finditer(sql):
+        kind, token = match.lastgroup, match.group()
+        if kind == 'space':
+            continue
+        if kind == 'other' and token in '<>=!' and tokens and tokens[-1][0] == 'operator':
+            previous = tokens.pop()
+            token = previous[1] + token
+            kind = 'operator'
+        elif kind == 'other' and token in '<>=!':
+            kind = 'operator'
+        name = token[1:-1] if kind == 'quoted' else token.lower()
+        tokens.append((kind, token, name))
+    return tokens
+
+
+def extract_predicates(sql, schema_columns):
+    """
+    Columns a statement filters or joins on, as a set of (table, column, kind)
+    where kind is 'equality', 'range' or 'join'. schema_columns maps each
+    table name to its set of column names; references are resolved through
+    the table aliases of the statement, subqueries included.
+    """
+    tokens = _tokens(sql)
+    aliases = table_aliases(sql, schema_columns)
+    tables = set(aliases.values())
+
+    def column_at(i):
+        """(table, column, index after the reference) for a column reference at i, else None"""
+        kind, _, name = tokens[i]
+        if kind not in ('word', 'quoted'):
+            return None
+        if i + 2 < len(tokens) and tokens[i + 1][1] == '.' and tokens[i + 2][0] in ('word', 'quoted'):
+            table, column = aliases.get(name), tokens[i + 2][2]
+            if table and column in schema_columns[table]:
+                return table, column, i + 3
+            return None
+        if i > 0 and tokens[i - 1][1] == '.':
+            return None
+        if kind == 'word' and (name in SQL_KEYWORDS or (i + 1 < len(tokens) and tokens[i + 1][1] == '(')):
+            return None
+        owners = [table for table in tables if name in schema_columns[table]]
+        if len(owners) == 1:
+            return owners[0], name, i + 1
+        return None
+
+    predicates = set()
+    clause = None
+    i = 0
+    while i < len(tokens):
+        kind, _, name = tokens[i]
+        if kind == 'word' and name in CLAUSE_STARTS:
+            clause = name
+        if clause not in PREDICATE_CLAUSES:
+            i += 1
+            continue
+        reference = column_at(i)
+        if reference is None:
+            i += 1
+            continue
+
+        table, column, after = reference
+        operator = tokens[after][2] if after < len(tokens) else None
+        if operator == 'not' and after + 1 < len(tokens):
+            # NOT IN and NOT BETWEEN rarely benefit from an index
+            operator = None
+        if operator == '=' and after + 1 < len(tokens):
+            other = column_at(after + 1)
+            if other is not None and other[0] != table:
+                predicates.add((table, column, 'join'))
+                predicates.add((other[0], other[1], 'join'))
+                i = other[2]
+                continue
+        if operator in EQUALITY_OPERATORS:
+            predicates.add((table, column, 'equality'))
+        elif operator in RANGE_OPERATORS:
+            predicates.add((table, column, 'range'))
+        i = after
+
+    return predicates
+
+
+def _plan_cost(plan):
+    return float(plan[0]['Plan']['Total Cost'])
+
+
+def _uses_index(plan, index_name):
+    return f'"Index Name": {json.dumps(index_name)}' in json.dumps(plan)
+
+
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class Candidate:
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = tuple(columns)
+        self.frequency = 0        # weighted number of statements it could serve
+        self.savings = 0.0        # estimated planner cost saved over the workload
+        self.improved = 0         # distinct statements whose plan uses it and got cheaper
+
+    @property
+    def name(self):
+        # Readable prefix plus a digest of the full key, so candidates whose names
+        # share the first 63 characters (PostgreSQL's limit) stay distinct
+        digest = hashlib.sha1(f"{self.table}\x00{','.join(self.columns)}".encode('utf-8')).hexdigest()[:8]
+        return f"{self.table}_{'_'.join(self.columns)}"[:42] + f"_{digest}_advised_idx"
+
+    def definition(self, name=None, concurrently=False):
+        columns = ', '.join(_quote_identifier(column) for column in self.columns)
+        prefix = 'CREATE INDEX CONCURRENTLY' if concurrently else 'CREATE INDEX'
+        return f"{prefix} {_quote_identifier(name or self.name)} ON {_quote_identifier(self.table)} ({columns})"
+
+
+class IndexAdvisor:
+    """
+    Recommends btree indexes for a data source from the SQL it has run.
+
+    Statements are grouped by their parameterized shape and weighted by how
+    often they ran. Candidate indexes come from the filter and join columns of
+    the workload, and each is scored by the drop in EXPLAIN total cost over the
+    statements it applies to. Candidates are evaluated as hypothetical indexes
+    when the hypopg extension is installed. Without it they can only be scored
+    with allow_real_builds, which builds each one inside a transaction that is
+    rolled back, blocking writes to its table meanwhile.
+    """
+
+    def __init__(self, db_service, allow_real_builds=False, lock_timeout_ms=2000, build_timeout_ms=60000):
+        self.db_service = db_service
+        self.allow_real_builds = allow_real_builds
+        self.lock_timeout_ms = lock_timeout_ms
+        self.build_timeout_ms = build_timeout_ms
+        self.statements = []          # [sql, weight, predicates, baseline cost]
+        self.candidates = {}          # (table, columns) -> Candidate
+        self.hypothetical = False
+        self.skipped = 0
+
+    @contextmanager
+    def _connection(self):
+        """
+        Pooled DBAPI connection in autocommit mode, so transactions are explicit;
+        it goes back to the pool in its default mode
+        """
+        proxy = self.db_service.engine.raw_connection()
+        conn = proxy.dbapi_connection
+        try:
+            conn.rollback()
+            conn.autocommit = True
+            yield conn
+        finally:
+            try:
+                conn.autocommit = False
+            finally:
+                proxy.close()
+
+    def _cursor(self, conn, statement):
+        # No parameters, so psycopg2 leaves a literal % in the SQL alone
+        cursor = conn.cursor()
+        cursor.execute(statement)
+        return cursor
+
+    def _explain(self, conn, sql):
+        cursor = self._cursor(conn, f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0]
+        cursor.close()
+        return plan if isinstance(plan, list) else json.loads(plan)
+
+    def _existing_indexes(self, conn):
+        cursor = self._cursor(conn, """
+            SELECT t.relname, array_agg(a.attname::text ORDER BY k.ord)
+            FROM pg_index i
+            JOIN pg_class t ON t.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = t.relnamespace
+            CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+            JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+            WHERE n.nspname = 'public'
+            GROUP BY t.relname, i.indexrelid
+        """)
+        existing = defaultdict(list)
+        for table, columns in cursor.fetchall():
+            existing[table].append(tuple(columns))
+        cursor.close()
+        return existing
+
+    def load(self, statements):
+        """
+        Parse the workload, measure its baseline cost and build the candidate list.
+        statements is an iterable of SQL strings, one per execution.
+        """
+        schema_info, _ = self.db_service.get_schema()
+        schema_columns = {table['table']: {column['name'] for column in table['columns']} for table in schema_info}
+
+        shapes = {}
+        weights = Counter()
+        for sql in statements:
+            parsed = parameterize(sql)
+            if parsed is None:
+                self.skipped += 1
+                continue
+            key = parsed[0]
+            # The most recent literal form stands in for the shape in EXPLAIN
+            shapes.setdefault(key, sql.strip().rstrip(';'))
+            weights[key] += 1
+
+        with self._connection() as conn:
+            self.hypothetical = bool(self._cursor(conn, "SELECT 1 FROM pg_extension WHERE extname = 'hypopg'").fetchone())
+            existing = self._existing_indexes(conn)
+
+            for key, sql in shapes.items():
+                predicates = extract_predicates(sql, schema_columns)
+                if not predicates:
+                    continue
+                try:
+                    cost = _plan_cost(self._explain(conn, sql))
+                except Exception:
+                    self.skipped += 1
+                    continue
+                self.statements.append([sql, weights[key], predicates, cost])
+
+        for _, weight, predicates, _ in self.statements:
+            by_table = defaultdict(lambda: defaultdict(set))
+            for table, column, kind in predicates:
+                by_table[table][kind].add(column)
+
+            for table, kinds in by_table.items():
+                options = [(column,) for columns in kinds.values() for column in columns]
+                # Equality columns lead a composite index, a range or second equality column follows
+                for first in sorted(kinds['equality'] | kinds['join']):
+                    for second in sorted((kinds['equality'] | kinds['range']) - {first}):
+                        options.append((first, second))
+                for columns in set(options):
+                    if any(index[:len(columns)] == columns for index in existing.get(table, ())):
+                        continue
+                    candidate = self.candidates.setdefault((table, columns), Candidate(table, columns))
+                    candidate.frequency += weight
+
+        return self
+
+    @property
+    def can_evaluate(self):
+        return self.hypothetical or self.allow_real_builds
+
+    def by_frequency(self, top=None):
+        """Unscored candidates, most used first"""
+        ranked = sorted(self.candidates.values(), key=lambda c: (-c.frequency, len(c.columns), c.table, c.columns))
+        return ranked[:top] if top else ranked
+
+    @property
+    def workload_cost(self):
+        return sum(weight * cost for _, weight, _, cost in self.statements)
+
+    def _with_indexes(self, conn, candidates, statements):
+        """
+        Total weighted cost of statements with the candidates in place, and the
+        set of candidates their plans use
+        """
+        if not self.can_evaluate:
+            raise RuntimeError("hypopg is not installed and real index builds are not allowed")
+        cursor = conn.cursor()
+        names = {}
+        try:
+            cursor.execute("BEGIN")
+            cursor.execute(f"SET LOCAL lock_timeout = {int(self.lock_timeout_ms)}")
+            cursor.execute(f"SET LOCAL statement_timeout = {int(self.build_timeout_ms)}")
+            for candidate in candidates:
+                if self.hypothetical:
+                    cursor.execute("SELECT indexname FROM hypopg_create_index(%s)", (candidate.definition('advisor'),))
+                    names[candidate] = cursor.fetchone()[0]
+                else:
+                    names[candidate] = f"advisor_{len(names)}"
+                    cursor.execute(candidate.definition(names[candidate]))
+
+            costs, used = [], set()
+            for sql, weight, _, baseline in statements:
+                cursor.execute("SAVEPOINT advisor_explain")
+                try:
+                    plan = self._explain(conn, sql)
+                except Exception:
+                    cursor.execute("ROLLBACK TO SAVEPOINT advisor_explain")
+                    costs.append(baseline * weight)
+                    continue
+                costs.append(_plan_cost(plan) * weight)
+                used.update(c for c, name in names.items() if _uses_index(plan, name))
+            return costs, used
+        finally:
+            cursor.execute("ROLLBACK")
+            if self.hypothetical:
+                # Hypothetical indexes belong to the session, not the transaction
+                cursor.execute("SELECT hypopg_reset()")
+            cursor.close()
+
+    def evaluate(self):
+        """Score every candidate on its own against the statements touching its table"""
+        with self._connection() as conn:
+            for candidate in self.candidates.values():
+                statements = [s for s in self.statements if any(p[0] == candidate.table for p in s[2])]
+                try:
+                    costs, used = self._with_indexes(conn, [candidate], statements)
+                except Exception as e:
+                    print(f"Error evaluating {candidate.definition()}: {e}")
+                    continue
+                if candidate not in used:
+                    continue
+                for (_, weight, _, baseline), cost in zip(statements, costs):
+                    saved = baseline * weight - cost
+                    if saved > 0:
+                        candidate.savings += saved
+                        candidate.improved += 1
+        return self
+
+    def recommend(self, min_savings_pct=1.0, top=None):
+        """
+        Best candidates by savings, skipping any whose leading columns are
+        already served by a better-ranked recommendation on the same table
+        """
+        total = self.workload_cost
+        ranked = sorted(self.candidates.values(), key=lambda c: (-c.savings, len(c.columns), c.table, c.columns))
+        chosen = []
+        for candidate in ranked:
+            if not total or candidate.savings * 100 / total < min_savings_pct:
+                break
+            if any(c.table == candidate.table and (c.columns[:len(candidate.columns)] == candidate.columns or
+                                                   candidate.columns[:len(c.columns)] == c.columns)
+                   for c in chosen):
+                continue
+            chosen.append(candidate)
+            if top and len(chosen) >= top:
+                break
+        return chosen
+
+    def combined_cost(self, candidates):
+        """Weighted workload cost with all the given candidates in place"""
+        if not candidates:
+            return self.workload_cost
+        with self._connection() as conn:
+            costs, _ = self._with_indexes(conn, candidates, self.statements)
+        return sum(costs)
+
+    def _relation_exists(self, conn, name):
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relname = %s
+        """, (name,))
+        exists = cursor.fetchone() is not None
+        cursor.close()
+        return exists
+
+    def apply(self, candidates):
+        """
+        Build the recommended indexes without blocking writes. Returns a
+        (statement, created) pair per candidate; a candidate whose name is
+        already taken, e.g. by an earlier --apply, is skipped.
+        """
+        applied = []
+        # Autocommit, as CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with self._connection() as conn:
+            for candidate in candidates:
+                statement = candidate.definition(concurrently=True)
+                if self._relation_exists(conn, candidate.name):
+                    applied.append((statement, False))
+                    continue
+                self._cursor(conn, statement).close()
+                applied.append((statement, True))
+        return applied
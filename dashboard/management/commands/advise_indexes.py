@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.db_service import get_database_service
+from dashboard.index_advisor_service import IndexAdvisor
+from dashboard.models import DataSource, Query
+from dashboard.sql_utils import validate_sql
+
+
+class Command(BaseCommand):
+    help = "Recommend indexes from the SQL in the query history, ranked by estimated workload savings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', help="Name of the data source to advise on, default database when omitted")
+        parser.add_argument('--limit', type=int, default=5000, help="Most recent queries to analyse")
+        parser.add_argument('--top', type=int, default=10, help="Maximum number of recommendations")
+        parser.add_argument('--min-savings', type=float, default=1.0,
+                            help="Minimum estimated saving, in percent of the workload cost")
+        parser.add_argument('--allow-real-builds', action='store_true',
+                            help="Without hypopg, score candidates by building each index in a transaction "
+                                 "that is rolled back. This blocks writes to the table while it builds")
+        parser.add_argument('--lock-timeout-ms', type=int, default=2000,
+                            help="Give up on a candidate when its table is locked longer than this "
+                                 "(only used with --allow-real-builds)")
+        parser.add_argument('--apply', action='store_true',
+                            help="Create the recommended indexes with CREATE INDEX CONCURRENTLY")
+
+    def handle(self, *args, **options):
+        data_source = None
+        if options['source']:
+            try:
+                data_source = DataSource.objects.get(name=options['source'])
+            except DataSource.DoesNotExist:
+                raise CommandError(f"No data source named {options['source']}")
+
+        history = (Query.objects.filter(data_source=data_source)
+                   .order_by('-created_at')
+                   .values_list('sql_query', flat=True)[:options['limit']])
+        statements = [sql for sql in (validate_sql(sql) for sql in history) if sql]
+        if not statements:
+            raise CommandError("No executable SQL in the query history")
+
+        advisor = IndexAdvisor(get_database_service(data_source), allow_real_builds=options['allow_real_builds'],
+                               lock_timeout_ms=options['lock_timeout_ms'])
+        advisor.load(statements)
+        if advisor.hypothetical:
+            mode = "hypothetical indexes (hypopg)"
+        elif advisor.can_evaluate:
+            mode = "indexes built and rolled back"
+        else:
+            mode = "no cost estimates (hypopg is not installed)"
+        self.stdout.write(
+            f"Analysed {len(statements)} queries: {len(advisor.statements)} statement shapes with predicates, "
+            f"{advisor.skipped} skipped, {len(advisor.candidates)} candidate indexes, evaluated with {mode}"
+        )
+        if not advisor.candidates:
+            self.stdout.write("No index candidates; the workload's filter and join columns are already indexed")
+            return
+
+        if not advisor.can_evaluate:
+            self.stdout.write(
+                "\nCandidates by use, unscored. Install hypopg, or pass --allow-real-builds to build "
+                "each index in a rolled back transaction, to estimate savings."
+            )
+            self.stdout.write(f"\n{'rank':>4}{'uses':>7}  index")
+            for rank, candidate in enumerate(advisor.by_frequency(options['top']), 1):
+                self.stdout.write(f"{rank:>4}{candidate.frequency:>7}  {candidate.table} ({', '.join(candidate.columns)})")
+            if options['apply']:
+                raise CommandError("--apply needs scored recommendations")
+            return
+
+        advisor.evaluate()
+        recommendations = advisor.recommend(options['min_savings'], options['top'])
+        total = advisor.workload_cost
+
+        self.stdout.write(f"\n{'rank':>4}{'saving %':>10}{'cost saved':>14}{'shapes':>8}{'uses':>7}  index")
+        for rank, candidate in enumerate(recommendations, 1):
+            self.stdout.write(
+                f"{rank:>4}{candidate.savings * 100 / total:>10.1f}{candidate.savings:>14,.0f}"
+                f"{candidate.improved:>8}{candidate.frequency:>7}  {candidate.table} ({', '.join(candidate.columns)})"
+            )
+        if not recommendations:
+            self.stdout.write(f"No candidate saves at least {options['min_savings']}% of the workload cost")
+            return
+
+        combined = advisor.combined_cost(recommendations)
+        self.stdout.write(
+            f"\nWorkload cost: {total:,.0f} -> {combined:,.0f} with all recommendations "
+            f"({(total - combined) * 100 / total:.1f}% lower)"
+        )
+
+        if not options['apply']:
+            self.stdout.write("\nRun with --apply to create them:")
+            for candidate in recommendations:
+                self.stdout.write(f"  {candidate.definition(concurrently=True)};")
+            return
+
+        for statement, created in advisor.apply(recommendations):
+            if created:
+                self.stdout.write(self.style.SUCCESS(f"Applied: {statement}"))
+            else:
+                self.stdout.write(self.style.WARNING(f"Skipped, a relation with this name already exists: {statement}"))
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.db_service import get_database_service
+from dashboard.export_service import EXPORT_FORMATS, stream_export
+from dashboard.models import Query
+
+
+class Command(BaseCommand):
+    help = "Compare size and time of the streamed export formats against the pandas CSV path"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sql', help="SQL query to export")
+        parser.add_argument('--query-id', type=int, help="Use the SQL of a saved Query")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per format, best time is reported")
+
+    def handle(self, *args, **options):
+        data_source = None
+        if options['query_id']:
+            query = Query.objects.get(id=options['query_id'])
+            sql_query, data_source = query.sql_query, query.data_source
+        elif options['sql']:
+            sql_query = options['sql']
+        else:
+            raise CommandError("Pass --sql or --query-id")
+
+        db_service = get_database_service(data_source)
+        repeat = max(1, options['repeat'])
+
+        def run_pandas_csv():
+            return db_service.get_csv(sql_query).encode('utf-8')
+
+        def run_streamed(fmt):
+            return b''.join(stream_export(db_service.iter_batches(sql_query, options['batch_size']), fmt))
+
+        runs = [('csv (pandas)', run_pandas_csv)]
+        runs += [(fmt, lambda fmt=fmt: run_streamed(fmt)) for fmt in EXPORT_FORMATS]
+
+        self.stdout.write(f"{'format':<16}{'bytes':>14}{'best ms':>12}{'vs pandas':>12}")
+        baseline = None
+        for name, run in runs:
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                size = len(run())
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            if baseline is None:
+                baseline = best
+            ratio = best / baseline if baseline else 0
+            self.stdout.write(f"{name:<16}{size:>14,}{best * 1000:>12.1f}{ratio:>11.2f}x")
@@ -0,0 +1,61 @@
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from dashboard.forms import QueryForm
+from dashboard.views import _result_summary
+
+
+class Command(BaseCommand):
+    help = "Measure query page render time and response size for synthetic results"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument('--columns', type=int, default=8)
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per size, best time is reported")
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/dashboard/query/')
+        request.user = AnonymousUser()
+        columns = [f'column_{i}' for i in range(options['columns'])]
+        chunk_size = settings.RESULT_CHUNK_SIZE
+
+        self.stdout.write(f"{'rows':>8}{'page ms':>10}{'page bytes':>14}{'chunk ms':>10}{'chunk bytes':>14}")
+        for row_count in options['rows']:
+            data = [{column: f'{column}_{i}' for column in columns} for i in range(row_count)]
+            result = {'success': True, 'data': data, 'columns': columns}
+            context = {
+                'form': QueryForm(),
+                'schema_info': [],
+                'sql_query': 'SELECT 1',
+                'result': _result_summary(result),
+                'chunk_size': chunk_size,
+                'pq': 1,
+                'query_id': 1,
+            }
+
+            page_time, page = self._best(options['repeat'], lambda: render_to_string(
+                'dashboard/query.html', context, request=request).encode('utf-8'))
+            chunk_time, chunk = self._best(options['repeat'], lambda: json.dumps({
+                'columns': columns,
+                'rows': [[row.get(column) for column in columns] for row in data[:chunk_size]],
+            }, cls=DjangoJSONEncoder).encode('utf-8'))
+
+            self.stdout.write(
+                f"{row_count:>8}{page_time * 1000:>10.1f}{len(page):>14,}{chunk_time * 1000:>10.1f}{len(chunk):>14,}"
+            )
+
+    def _best(self, repeat, run):
+        best, output = None, None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            output = run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.startup import LAZY_MODULES
+
+# Runs in a fresh interpreter so nothing is already imported
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+if sys.argv[1] == '1':
+    from dashboard.startup import preload
+    preload()
+elapsed = (time.perf_counter() - started) * 1000
+rss_kb = 0
+try:
+    with open('/proc/self/status') as status:
+        rss_kb = next(int(line.split()[1]) for line in status if line.startswith('VmRSS:'))
+except (OSError, StopIteration):
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = [name for name in json.loads(sys.argv[2]) if name in sys.modules]
+print(json.dumps({'elapsed_ms': elapsed, 'rss_kb': rss_kb, 'heavy': heavy}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Report import time per module and resident memory for a cold start of the app"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help="Number of slowest modules to list")
+        parser.add_argument('--preload', action='store_true', help="Run the preload hook as a warm worker would")
+        parser.add_argument('--max-startup-ms', type=float, help="Fail when startup takes longer")
+        parser.add_argument('--max-rss-mb', type=float, help="Fail when resident memory is higher")
+        parser.add_argument('--forbid-heavy', action='store_true',
+                            help="Fail when a heavy dependency is imported at startup without --preload")
+
+    def handle(self, *args, **options):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT,
+             '1' if options['preload'] else '0', json.dumps(LAZY_MODULES)],
+            capture_output=True, text=True, env=os.environ.copy(),
+        )
+        if process.returncode != 0:
+            raise CommandError(f"Startup failed:\n{process.stderr[-2000:]}")
+
+        report = json.loads(process.stdout.strip().splitlines()[-1])
+        modules = []
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            self_us, cumulative_us, name = [part.strip() for part in line[len('import time:'):].split('|')]
+            # Nesting is shown by indentation; top-level imports carry the whole subtree
+            modules.append((int(cumulative_us), int(self_us), name))
+
+        startup_ms = report['elapsed_ms']
+        rss_mb = report['rss_kb'] / 1024
+
+        self.stdout.write(f"Startup: {startup_ms:.0f} ms, RSS: {rss_mb:.1f} MB")
+        self.stdout.write(f"Heavy modules loaded: {', '.join(report['heavy']) or 'none'}")
+        self.stdout.write(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+        for cumulative_us, self_us, name in sorted(modules, reverse=True)[:options['top']]:
+            self.stdout.write(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name.strip()}")
+
+        failures = []
+        if options['max_startup_ms'] is not None and startup_ms > options['max_startup_ms']:
+            failures.append(f"startup {startup_ms:.0f} ms > {options['max_startup_ms']:.0f} ms")
+        if options['max_rss_mb'] is not None and rss_mb > options['max_rss_mb']:
+            failures.append(f"RSS {rss_mb:.1f} MB > {options['max_rss_mb']:.1f} MB")
+        if options['forbid_heavy'] and not options['preload'] and report['heavy']:
+            failures.append(f"heavy modules imported at startup: {', '.join(report['heavy'])}")
+        if failures:
+            raise CommandError("; ".join(failures))
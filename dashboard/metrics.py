@@ -0,0 +1,36 @@
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+
+
+def incr(name, value=1):
+    """Add to a per-process counter"""
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name, value):
+    """Record the current value of a per-process gauge"""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, value, buckets):
+    """Record a value in a cumulative histogram: count, sum, max and one counter per upper bound"""
+    with _lock:
+        _counters[f'{name}.count'] += 1
+        _counters[f'{name}.sum'] += value
+        _gauges[f'{name}.max'] = max(_gauges.get(f'{name}.max', 0), value)
+        for bound in buckets:
+            if value <= bound:
+                _counters[f'{name}.le_{bound}'] += 1
+        _counters[f'{name}.le_inf'] += 1
+
+
+def snapshot():
+    """Copy of all counters and gauges, as served by the metrics view"""
+    with _lock:
+        return {'counters': dict(_counters), 'gauges': dict(_gauges)}
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_rename_is_helpful_queryfeedback_help_full_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('host', models.CharField(max_length=255)),
+                ('port', models.PositiveIntegerField(default=5432)),
+                ('dbname', models.CharField(max_length=255)),
+                ('user', models.CharField(max_length=255)),
+                ('password', models.CharField(blank=True, default='', max_length=255)),
+                ('prompt_context', models.TextField(blank=True, default='')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='query',
+            name='data_source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='queries', to='dashboard.datasource'),
+        ),
+        migrations.AddField(
+            model_name='queryfeedback',
+            name='data_source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='dashboard.datasource'),
+        ),
+    ]
@@ -1,8 +1,29 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+class DataSource(models.Model):
+    """A PostgreSQL database the NL to SQL front end can query"""
+    name = models.CharField(max_length=100, unique=True)
+    host = models.CharField(max_length=255)
+    port = models.PositiveIntegerField(default=5432)
+    dbname = models.CharField(max_length=255)
+    user = models.CharField(max_length=255)
+    password = models.CharField(max_length=255, blank=True, default="")
+    prompt_context = models.TextField(blank=True, default="")           # Schema text for the LLM, introspected when empty
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 class Query(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='queries')
+    data_source = models.ForeignKey(DataSource, on_delete=models.SET_NULL, null=True, blank=True, related_name='queries')  # Null means the default database
     natural_language = models.TextField()
     sql_query = models.TextField()
     result = models.JSONField(null=True, blank=True)  # result field stores JSON data
@@ -23,6 +44,7 @@ class QueryFeedback(models.Model):
     nlp_given = models.TextField(default="")                             # Default: empty string
     query_sql = models.TextField(default="")                             # Default: empty string
     query_user = models.ForeignKey(User, on_delete=models.CASCADE)       # Must be provided explicitly
+    data_source = models.ForeignKey(DataSource, on_delete=models.SET_NULL, null=True, blank=True)  # Null means the default database
     rating = models.IntegerField(choices=RATING_CHOICES, default=3)      # Default: 3 (midpoint)
     comments = models.TextField(blank=True, null=True, default="")       # Default: empty string
     created_at = models.DateTimeField(auto_now_add=True)                 # Auto-set at creation
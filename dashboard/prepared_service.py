@@ -0,0 +1,225 @@
+import hashlib
+import re
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import metrics
+from .sql_utils import TOKEN_RE
+
+# Keywords whose following string literal is part of the type syntax, e.g. DATE '2024-01-01'
+TYPED_LITERAL_KEYWORDS = {'date', 'time', 'timestamp', 'timestamptz', 'interval', 'zone'}
+
+# Types whose parenthesised modifiers must stay literal, e.g. numeric(10, 2)
+MODIFIER_TYPES = {'numeric', 'decimal', 'varchar', 'char', 'character', 'varying', 'bit',
+                  'time', 'timestamp', 'timestamptz', 'interval'}
+
+# Clauses where a bare integer is a column position, not a value
+POSITIONAL_CLAUSES = {'order', 'group'}
+CLAUSE_KEYWORDS = {'select', 'from', 'where', 'having', 'limit', 'offset', 'fetch', 'union',
+                   'intersect', 'except', 'window', 'for', 'join', 'on'}
+
+INT4_MIN, INT4_MAX = -2 ** 31, 2 ** 31 - 1
+INT8_MIN, INT8_MAX = -2 ** 63, 2 ** 63 - 1
+
+# (database URL, statement name) pairs that failed to prepare in this process; keyed by
+# database because a shape can fail on one source (e.g. a missing table) and work on another.
+# Bounded so it cannot grow forever
+_unpreparable = set()
+_UNPREPARABLE_LIMIT = 1000
+
+
+def parameterize(sql_query):
+    """
+    Pull string and numeric literals out of a SELECT into $n parameters.
+
+    Returns (shape, params, types), where shape is the statement with $1..$n
+    in place of the literals, or None when the statement is not safe to
+    rewrite (comments, dollar quoting, existing parameters, escape strings).
+    """
+    sql = sql_query.strip().rstrip(';').strip()
+    if not re.match(r'^(SELECT|WITH)\b', sql, re.IGNORECASE):
+        return None
+    if re.search(r"--|/\*|\$", sql):
+        return None
+
+    parts, params, types = [], [], []
+    previous_word = None
+    positional = False
+    depth = 0
+    positional_depth = 0
+    modifier_depth = None
+
+    previous_token = None
+    for match in TOKEN_RE.finditer(sql):
+        kind, token = match.lastgroup, match.group()
+        adjacent, previous_token = previous_token, token
+
+        if kind == 'word':
+            word = token.lower()
+            if word in POSITIONAL_CLAUSES:
+                positional, positional_depth = True, depth
+            elif word in CLAUSE_KEYWORDS and depth <= positional_depth:
+                positional = False
+            previous_word = word
+            parts.append(token)
+            continue
+        if kind == 'other':
+            if token == '(':
+                depth += 1
+                if previous_word in MODIFIER_TYPES:
+                    modifier_depth = depth
+            elif token == ')':
+                if depth == modifier_depth:
+                    modifier_depth = None
+                depth -= 1
+                if depth < positional_depth:
+                    positional = False
+            previous_word = None
+            parts.append(token)
+            continue
+        if kind != 'string' and kind != 'number':
+            parts.append(token)
+            continue
+
+        if kind == 'string':
+            if adjacent is not None and adjacent.upper() in ('E', 'B', 'X', 'N', 'U&', '&'):
+                # Escape, bit and national strings keep their own syntax
+                return None
+            if previous_word in TYPED_LITERAL_KEYWORDS:
+                parts.append(token)
+                previous_word = None
+                continue
+            params.append(token[1:-1].replace("''", "'"))
+            # Left untyped so PostgreSQL infers it from the context, like the literal it replaces
+            types.append('unknown')
+        else:
+            if depth == modifier_depth or (positional and depth == positional_depth and re.fullmatch(r'\d+', token)):
+                parts.append(token)
+                continue
+            if re.fullmatch(r'\d+', token):
+                value = int(token)
+                params.append(value)
+                # Same typing as PostgreSQL gives the literal: integers beyond int8 are numeric
+                if INT4_MIN <= value <= INT4_MAX:
+                    types.append('int')
+                elif INT8_MIN <= value <= INT8_MAX:
+                    types.append('bigint')
+                else:
+                    types.append('numeric')
+            else:
+                params.append(token)
+                types.append('numeric')
+        previous_word = None
+        parts.append(f'${len(params)}')
+
+    return ''.join(parts), params, types
+
+
+def statement_name(shape, types):
+    digest = hashlib.sha1(f"{shape}\x00{','.join(types)}".encode('utf-8')).hexdigest()
+    return f"nl2sql_{digest[:20]}"
+
+
+def _execute_raw(conn, statement):
+    """
+    Run a statement on the DBAPI cursor without parameters, so a literal % in
+    the SQL is not taken for a placeholder. Returns the first row, if any.
+    """
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(statement)
+        return cursor.fetchone() if cursor.description else None
+    finally:
+        cursor.close()
+
+
+def _planning_time(conn, sql_query):
+    """Planning time in ms of the literal statement, used to estimate what a cache hit saves"""
+    try:
+        with conn.begin_nested():
+            plan = _execute_raw(conn, f"EXPLAIN (SUMMARY, FORMAT JSON) {sql_query}")[0]
+        return float(plan[0].get('Planning Time', 0.0))
+    except Exception:
+        return 0.0
+
+
+def read_sql_prepared(sql_query, conn):
+    """
+    Run a query through a server-side prepared statement cached on the pooled
+    connection, keyed by its parameterized shape. Falls back to running the
+    literal SQL when the statement cannot be parameterized or prepared.
+    """
+    import pandas as pd
+
+    cache = conn.info.setdefault('prepared_statements', OrderedDict())   # name -> planning ms
+    stale = conn.info.setdefault('stale_statements', [])
+
+    # Statements whose EXECUTE failed earlier are dropped before their name is reused
+    while stale:
+        try:
+            with conn.begin_nested():
+                _execute_raw(conn, f"DEALLOCATE {stale.pop()}")
+        except Exception:
+            pass
+
+    parsed = parameterize(sql_query)
+    if parsed is None:
+        metrics.incr('prepared.skipped')
+        return pd.read_sql_query(sql_query, conn)
+
+    shape, params, types = parsed
+    name = statement_name(shape, types)
+    unpreparable_key = (conn.engine.url, name)
+
+    if name in cache:
+        cache.move_to_end(name)
+        metrics.incr('prepared.hits')
+        metrics.incr('prepared.planning_ms_saved', cache[name])
+    elif unpreparable_key in _unpreparable:
+        metrics.incr('prepared.fallbacks')
+        return pd.read_sql_query(sql_query, conn)
+    else:
+        try:
+            # Savepoint so a failed PREPARE leaves the surrounding transaction usable
+            with conn.begin_nested():
+                type_list = f"({', '.join(types)})" if types else ""
+                _execute_raw(conn, f"PREPARE {name}{type_list} AS {shape}")
+        except Exception:
+            if len(_unpreparable) >= _UNPREPARABLE_LIMIT:
+                _unpreparable.clear()
+            _unpreparable.add(unpreparable_key)
+            metrics.incr('prepared.fallbacks')
+            return pd.read_sql_query(sql_query, conn)
+
+        metrics.incr('prepared.misses')
+        cache[name] = _planning_time(conn, sql_query)
+        while len(cache) > settings.PREPARED_STATEMENT_CACHE_SIZE:
+            evicted, _ = cache.popitem(last=False)
+            _execute_raw(conn, f"DEALLOCATE {evicted}")
+            metrics.incr('prepared.evictions')
+
+    statement = f"EXECUTE {name}({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {name}"
+    try:
+        return pd.read_sql_query(statement, conn, params=tuple(params) if params else None)
+    except Exception as e:
+        # e.g. "cached plan must not change result type" after DDL; re-prepare next time
+        cache.pop(name, None)
+        stale.append(name)
+        raise Exception(str(e).replace(statement, sql_query)) from e
+
+
+def stats():
+    """Prepared statement counters with the derived hit rate"""
+    counters = metrics.snapshot()['counters']
+    hits = counters.get('prepared.hits', 0)
+    lookups = hits + counters.get('prepared.misses', 0) + counters.get('prepared.fallbacks', 0)
+    return {
+        'hits': int(hits),
+        'misses': int(counters.get('prepared.misses', 0)),
+        'fallbacks': int(counters.get('prepared.fallbacks', 0)),
+        'skipped': int(counters.get('prepared.skipped', 0)),
+        'evictions': int(counters.get('prepared.evictions', 0)),
+        'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+        'planning_ms_saved': round(counters.get('prepared.planning_ms_saved', 0.0), 1),
+    }
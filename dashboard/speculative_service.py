@@ -0,0 +1,166 @@
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .sql_utils import validate_sql
+
+logger = logging.getLogger(__name__)
+
+NOT_RELEVANT = 'NOT RELEVENT QUESTION'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Bounded thread pool shared by all speculative runs in this process"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.SPECULATIVE_MAX_WORKERS,
+                                           thread_name_prefix='speculative')
+        return _executor
+
+
+class CandidateCancelled(Exception):
+    pass
+
+
+def _when_done(futures, callback):
+    """Call callback once all futures are done, right away when there are none"""
+    if not futures:
+        callback()
+        return
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def finished(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    for future in futures:
+        future.add_done_callback(finished)
+
+
+def _normalize(sql):
+    return re.sub(r'\s+', ' ', sql).strip().lower()
+
+
+class SpeculativeRunner:
+    """
+    Requests several SQL candidates at once, executes the valid ones
+    concurrently and returns the first that succeeds. Outstanding LLM calls
+    are abandoned and statements still running are cancelled with
+    pg_cancel_backend.
+    """
+
+    def __init__(self, llm_service, db_service, candidates=None, timeout=None, value_index=None):
+        temperatures = settings.SPECULATIVE_TEMPERATURES
+        count = min(candidates or settings.SPECULATIVE_CANDIDATES, settings.SPECULATIVE_CANDIDATES)
+        self.llm_service = llm_service
+        self.db_service = db_service
+        self.value_index = value_index
+        self.temperatures = [temperatures[i % len(temperatures)] for i in range(max(1, count))]
+        self.timeout = timeout or settings.SPECULATIVE_TIMEOUT_SECONDS
+
+    def run(self, natural_language, prompt_context, value_hints=None, on_generated=None):
+        """
+        Returns (sql_query, result, stats). When no candidate succeeds, the
+        first valid candidate and its error result are returned.
+
+        on_generated is called once every LLM call of the run has finished,
+        including calls abandoned when the race ended, possibly after run returns.
+        """
+        started = time.monotonic()
+        deadline = started + settings.SPECULATIVE_LLM_TIMEOUT_SECONDS + self.timeout
+        stats = {'candidates': len(self.temperatures), 'generated': 0, 'valid': 0, 'executed': 0, 'winner': None}
+
+        pids = {}                  # candidate index -> backend pid
+        cancelled = set()          # losing candidates whose backend was not known yet
+        pids_lock = threading.Lock()
+        seen = set()
+        fallback = None
+        winner = None
+
+        executor = _get_executor()
+        generating = {
+            executor.submit(self.llm_service.generate_sql, natural_language, prompt_context, temperature, value_hints): index
+            for index, temperature in enumerate(self.temperatures)
+        }
+        executing = {}             # execution future -> (candidate index, sql)
+
+        def execute(index, sql):
+            def track(pid):
+                # Holding the lock while cancelling keeps a finished backend from
+                # being handed to another request before its pid is forgotten
+                with pids_lock:
+                    if pid is None:
+                        pids.pop(index, None)
+                    elif index in cancelled:
+                        # Lost the race before the statement started; don't run it
+                        raise CandidateCancelled(f"Speculative candidate {index} was cancelled")
+                    else:
+                        pids[index] = pid
+            return self.db_service.execute_query(sql, timeout=self.timeout, on_backend=track)
+
+        try:
+            while (generating or executing) and winner is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(list(generating) + list(executing), timeout=remaining, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    if future in generating:
+                        index = generating.pop(future)
+                        try:
+                            sql = validate_sql(future.result())
+                        except Exception as e:
+                            logger.warning(f"Speculative candidate {index} failed to generate: {e}")
+                            continue
+                        stats['generated'] += 1
+                        if sql is not None and self.value_index is not None:
+                            sql = self.value_index.fix_literals(sql)
+                        if sql is None or _normalize(sql) in seen:
+                            continue
+                        seen.add(_normalize(sql))
+                        stats['valid'] += 1
+                        executing[executor.submit(execute, index, sql)] = (index, sql)
+                        stats['executed'] += 1
+                    elif future in executing:
+                        index, sql = executing.pop(future)
+                        result = future.result()
+                        if result.get('success'):
+                            winner = (sql, result)
+                            stats['winner'] = index
+                            break
+                        if fallback is None:
+                            fallback = (sql, result)
+        finally:
+            for future in generating:
+                future.cancel()
+            for future, (index, _) in executing.items():
+                if not future.cancel():
+                    with pids_lock:
+                        if index in pids:
+                            self.db_service.cancel_backend(pids[index])
+                        else:
+                            cancelled.add(index)
+            if on_generated is not None:
+                _when_done([future for future in generating if not future.done()], on_generated)
+
+        stats['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+        logger.info(f"Speculative run: {stats}")
+
+        if winner is not None:
+            return winner[0], winner[1], stats
+        if fallback is not None:
+            return fallback[0], fallback[1], stats
+        return NOT_RELEVANT, {'success': False, 'error': 'No valid SQL candidate was generated in time'}, stats
@@ -0,0 +1,91 @@
+import re
+
+TOKEN_RE = re.compile(r"""
+    (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<word>[A-Za-z_][\w$]*)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<space>\s+)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+# Keywords that start a clause of a SELECT
+CLAUSE_KEYWORDS = {'select', 'from', 'where', 'having', 'group', 'order', 'limit', 'offset', 'fetch', 'union',
+                   'intersect', 'except', 'window', 'for', 'join', 'on'}
+
+# Words that can follow a table reference but are never its alias
+SQL_KEYWORDS = {
+    'select', 'from', 'where', 'join', 'inner', 'left', 'right', 'full', 'outer', 'cross', 'natural',
+    'on', 'using', 'and', 'or', 'not', 'in', 'is', 'null', 'between', 'like', 'ilike', 'group', 'order',
+    'by', 'having', 'limit', 'offset', 'union', 'intersect', 'except', 'as', 'with', 'distinct', 'case',
+    'when', 'then', 'else', 'end', 'asc', 'desc', 'lateral', 'fetch', 'window', 'exists', 'all', 'any',
+}
+
+
+def table_aliases(sql_query, tables):
+    """
+    Names a statement uses for the given tables in its FROM and JOIN clauses,
+    subqueries included: each table name and alias maps to its table. Unquoted
+    identifiers are folded to lower case, as PostgreSQL does.
+    """
+    tokens = []
+    for match in TOKEN_RE.finditer(sql_query):
+        kind, token = match.lastgroup, match.group()
+        if kind != 'space':
+            tokens.append((kind, token[1:-1].replace('""', '"') if kind == 'quoted' else token.lower()))
+
+    aliases = {}
+    clauses = [None]          # current clause at each parenthesis depth
+    for i, (kind, name) in enumerate(tokens):
+        if name == '(':
+            clauses.append(None)
+            continue
+        if name == ')':
+            if len(clauses) > 1:
+                clauses.pop()
+            continue
+        if kind == 'word' and name in CLAUSE_KEYWORDS:
+            clauses[-1] = name
+            if name not in ('from', 'join'):
+                continue
+        elif not (name == ',' and clauses[-1] in ('from', 'join', 'on')):
+            # A comma in the FROM list starts another table reference
+            continue
+
+        reference = tokens[i + 1:i + 6]
+        if not reference or reference[0][0] not in ('word', 'quoted'):
+            continue
+        if len(reference) >= 3 and reference[1][1] == '.' and reference[2][0] in ('word', 'quoted'):
+            # Schema-qualified name
+            reference = reference[2:]
+        table = reference[0][1]
+        if table not in tables:
+            continue
+        aliases[table] = table
+        rest = reference[1:]
+        if rest and rest[0] == ('word', 'as'):
+            rest = rest[1:]
+        if rest and rest[0][0] in ('word', 'quoted') and rest[0][1] not in SQL_KEYWORDS:
+            aliases[rest[0][1]] = table
+    return aliases
+
+
+def validate_sql(sql_query):
+    """
+    Cheap local checks on a generated statement. Returns the cleaned SQL, or
+    None when the candidate is not worth sending to the database.
+    """
+    if not sql_query:
+        return None
+
+    sql = sql_query.strip().rstrip(';').strip()
+    if not re.match(r'^(SELECT|WITH)\b', sql, re.IGNORECASE):
+        return None
+
+    # Strip string literals before looking at the statement structure
+    if sql.count("'") % 2:
+        return None
+    bare = re.sub(r"'[^']*'", "''", sql)
+    if ';' in bare or bare.count('(') != bare.count(')'):
+        return None
+    return sql
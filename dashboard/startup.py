@@ -0,0 +1,44 @@
+import importlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Third-party modules the service layer imports on first use; a plain startup must not load them
+LAZY_MODULES = [
+    'pandas',
+    'sqlalchemy',
+    'requests',
+    'pyarrow',
+    'pyarrow.parquet',
+]
+
+# Everything preload() imports. psycopg2 is loaded by Django's postgresql backend during setup anyway
+HEAVY_MODULES = LAZY_MODULES + ['psycopg2']
+
+
+def preload(connect=False):
+    """
+    Import the heavy service dependencies up front instead of on the first
+    request. With connect=True also open the default database pool and cache
+    its schema and value index.
+
+    Call it from a worker hook (e.g. gunicorn post_fork) or set PRELOAD_SERVICES.
+    """
+    started = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Preload skipped {name}: {e}")
+
+    if connect:
+        from .db_service import get_database_service
+
+        db_service = get_database_service()
+        db_service.get_schema()
+        db_service.get_value_index(wait=True)
+
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.info(f"Preloaded service dependencies in {elapsed:.0f} ms")
+    return elapsed
@@ -0,0 +1,110 @@
+// Virtualized result table: only the rows inside the scroll viewport are kept in
+// the DOM, and rows are fetched from the JSON results endpoint one chunk at a time.
+(function () {
+    'use strict';
+
+    var ROW_HEIGHT = 45;       // must match #queryResults tbody td height in query.html
+    var OVERSCAN = 10;         // extra rows rendered above and below the viewport
+    var MAX_CACHED_CHUNKS = 20;
+
+    function VirtualTable(container) {
+        this.url = container.dataset.url;
+        this.total = parseInt(container.dataset.total, 10) || 0;
+        this.chunkSize = parseInt(container.dataset.chunkSize, 10) || 500;
+        this.viewport = container.querySelector('.virtual-viewport');
+        this.tbody = container.querySelector('tbody');
+        this.columnCount = container.querySelectorAll('thead th').length;
+        this.chunks = new Map();
+        this.pending = new Map();
+        this.frame = null;
+
+        this.viewport.addEventListener('scroll', this.schedule.bind(this), { passive: true });
+        window.addEventListener('resize', this.schedule.bind(this));
+        this.render();
+    }
+
+    VirtualTable.prototype.schedule = function () {
+        if (this.frame === null) {
+            this.frame = window.requestAnimationFrame(function () {
+                this.frame = null;
+                this.render();
+            }.bind(this));
+        }
+    };
+
+    VirtualTable.prototype.loadChunk = function (index) {
+        if (this.chunks.has(index) || this.pending.has(index)) {
+            return;
+        }
+        var url = this.url + '?offset=' + (index * this.chunkSize) + '&limit=' + this.chunkSize;
+        var request = fetch(url, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+            .then(function (response) { return response.json(); })
+            .then(function (payload) {
+                this.pending.delete(index);
+                if (!payload.success) {
+                    return;
+                }
+                this.chunks.set(index, payload.rows);
+                // Drop the oldest chunks so memory stays bounded on very large results
+                while (this.chunks.size > MAX_CACHED_CHUNKS) {
+                    this.chunks.delete(this.chunks.keys().next().value);
+                }
+                this.schedule();
+            }.bind(this))
+            .catch(function () {
+                this.pending.delete(index);
+            }.bind(this));
+        this.pending.set(index, request);
+    };
+
+    VirtualTable.prototype.getRow = function (rowIndex) {
+        var chunk = this.chunks.get(Math.floor(rowIndex / this.chunkSize));
+        return chunk ? chunk[rowIndex % this.chunkSize] : null;
+    };
+
+    VirtualTable.prototype.spacer = function (height) {
+        var row = document.createElement('tr');
+        var cell = document.createElement('td');
+        cell.colSpan = this.columnCount;
+        cell.style.height = height + 'px';
+        cell.style.padding = '0';
+        cell.style.border = '0';
+        row.appendChild(cell);
+        return row;
+    };
+
+    VirtualTable.prototype.render = function () {
+        var scrollTop = this.viewport.scrollTop;
+        var visible = Math.ceil(this.viewport.clientHeight / ROW_HEIGHT) || 1;
+        var start = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN);
+        var end = Math.min(this.total, start + visible + OVERSCAN * 2);
+
+        for (var c = Math.floor(start / this.chunkSize); c * this.chunkSize < end; c++) {
+            this.loadChunk(c);
+        }
+
+        var fragment = document.createDocumentFragment();
+        fragment.appendChild(this.spacer(start * ROW_HEIGHT));
+        for (var i = start; i < end; i++) {
+            var values = this.getRow(i);
+            var tr = document.createElement('tr');
+            for (var j = 0; j < this.columnCount; j++) {
+                var td = document.createElement('td');
+                var value = values ? values[j] : '';
+                td.textContent = value === null ? 'None' : value;
+                tr.appendChild(td);
+            }
+            fragment.appendChild(tr);
+        }
+        fragment.appendChild(this.spacer((this.total - end) * ROW_HEIGHT));
+
+        this.tbody.replaceChildren(fragment);
+    };
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var container = document.getElementById('queryResults');
+        if (container && container.dataset.url) {
+            new VirtualTable(container);
+        }
+    });
+})();
@@ -0,0 +1,138 @@
+import heapq
+
+from django.test import SimpleTestCase, override_settings
+
+from dashboard.admission_service import EXPORT, INTERACTIVE, RERUN, AdmissionRejected, Scheduler, TokenBucket, _Gate
+
+ADMISSION_SETTINGS = dict(
+    ADMISSION_ENABLED=True, ADMISSION_LLM_CONCURRENCY=1, ADMISSION_SQL_CONCURRENCY=1, ADMISSION_QUEUE_SIZE=0,
+    ADMISSION_QUEUE_TIMEOUT_SECONDS=0.01, ADMISSION_LLM_USER_RATE=1, ADMISSION_LLM_USER_BURST=3,
+    ADMISSION_LLM_GLOBAL_RATE=60, ADMISSION_LLM_GLOBAL_BURST=10, ADMISSION_MAX_TRACKED_USERS=100,
+)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.bucket = TokenBucket(rate=2, capacity=4)
+        self.start = self.bucket.updated
+
+    def test_full_bucket_admits_up_to_its_capacity(self):
+        self.assertEqual(self.bucket.wait_time(4, self.start), 0)
+        self.bucket.take(4)
+        self.assertEqual(self.bucket.wait_time(1, self.start), 0.5)
+
+    def test_tokens_refill_at_the_rate_up_to_the_capacity(self):
+        self.bucket.take(4)
+        self.assertEqual(self.bucket.wait_time(1, self.start + 0.5), 0)
+        self.assertEqual(self.bucket.wait_time(4, self.start + 10), 0)
+        self.assertEqual(self.bucket.tokens, 4)
+
+    def test_refund_does_not_overfill(self):
+        self.bucket.take(1)
+        self.bucket.refund(3)
+        self.assertEqual(self.bucket.tokens, 4)
+
+    def test_zero_rate_never_refills(self):
+        bucket = TokenBucket(rate=0, capacity=1)
+        bucket.take(1)
+        self.assertEqual(bucket.wait_time(1, bucket.updated + 60), float('inf'))
+
+
+class GateTests(SimpleTestCase):
+    def setUp(self):
+        self.gate = _Gate('test', concurrency=4, queue_size=8)
+
+    def _enqueue(self, priority, cost):
+        """Queue a waiter the way acquire() does, without blocking the test"""
+        entry = [priority, next(self.gate._sequence), 'waiting', cost]
+        heapq.heappush(self.gate._waiting, entry)
+        self.gate.queued += 1
+        return entry
+
+    def test_work_takes_several_slots(self):
+        self.assertEqual(self.gate.acquire(INTERACTIVE, timeout=0, cost=3), 0)
+        self.assertEqual(self.gate.active, 3)
+        with self.assertRaises(AdmissionRejected):
+            self.gate.acquire(INTERACTIVE, timeout=0, cost=2)
+        self.gate.acquire(INTERACTIVE, timeout=0, cost=1)
+        self.assertEqual(self.gate.active, 4)
+
+    def test_released_slots_go_to_waiters_in_priority_order(self):
+        self.gate.acquire(INTERACTIVE, timeout=0, cost=4)
+        export = self._enqueue(EXPORT, 1)
+        rerun = self._enqueue(RERUN, 1)
+        first = self._enqueue(INTERACTIVE, 1)
+        second = self._enqueue(INTERACTIVE, 1)
+
+        self.gate.release(0, cost=2)
+        self.assertEqual([first[2], second[2], rerun[2], export[2]], ['granted', 'granted', 'waiting', 'waiting'])
+        self.gate.release(0, cost=1)
+        self.assertEqual([rerun[2], export[2]], ['granted', 'waiting'])
+        self.assertEqual((self.gate.active, self.gate.queued), (4, 1))
+
+    def test_waiter_that_does_not_fit_holds_back_those_behind_it(self):
+        self.gate.acquire(INTERACTIVE, timeout=0, cost=4)
+        wide = self._enqueue(INTERACTIVE, 3)
+        narrow = self._enqueue(RERUN, 1)
+
+        self.gate.release(0, cost=2)
+        self.assertEqual([wide[2], narrow[2]], ['waiting', 'waiting'])
+        self.gate.release(0, cost=1)
+        self.assertEqual([wide[2], narrow[2]], ['granted', 'waiting'])
+        self.gate.release(0, cost=1)
+        self.assertEqual(narrow[2], 'granted')
+        self.assertEqual(self.gate.active, 4)
+
+    def test_cancelled_waiters_are_skipped(self):
+        self.gate.acquire(INTERACTIVE, timeout=0, cost=4)
+        cancelled = self._enqueue(INTERACTIVE, 4)
+        cancelled[2] = 'cancelled'
+        self.gate.queued -= 1
+        waiting = self._enqueue(RERUN, 1)
+
+        self.gate.release(0, cost=1)
+        self.assertEqual(waiting[2], 'granted')
+        self.assertEqual(self.gate._waiting, [])
+
+    def test_full_queue_rejects_straight_away(self):
+        gate = _Gate('test', concurrency=1, queue_size=0)
+        gate.acquire(INTERACTIVE, timeout=0)
+        with self.assertRaises(AdmissionRejected) as rejected:
+            gate.acquire(INTERACTIVE, timeout=10)
+        self.assertEqual(rejected.exception.status, 503)
+
+
+@override_settings(**ADMISSION_SETTINGS)
+class SchedulerTests(SimpleTestCase):
+    def test_rejected_work_is_not_charged_to_the_rate_limits(self):
+        scheduler = Scheduler()
+        ticket = scheduler.admit('llm', user_id=1)
+        with self.assertRaises(AdmissionRejected) as rejected:
+            scheduler.admit('llm', user_id=1)
+        self.assertEqual(rejected.exception.status, 503)
+        ticket.release()
+
+        # The 503 was refunded, so two of the three tokens are left
+        scheduler.admit('llm', user_id=1).release()
+        scheduler.admit('llm', user_id=1).release()
+        with self.assertRaises(AdmissionRejected) as rejected:
+            scheduler.admit('llm', user_id=1)
+        self.assertEqual(rejected.exception.status, 429)
+
+    @override_settings(ADMISSION_WORKERS=4, ADMISSION_LLM_CONCURRENCY=8, ADMISSION_SQL_CONCURRENCY=2,
+                       ADMISSION_LLM_USER_RATE=8, ADMISSION_LLM_USER_BURST=8)
+    def test_limits_are_shared_between_workers(self):
+        scheduler = Scheduler()
+        self.assertEqual(scheduler._gates['llm'].concurrency, 2)
+        self.assertEqual(scheduler._gates['sql'].concurrency, 1)
+        self.assertEqual(scheduler._global_bucket.capacity, 2.5)
+        scheduler.admit('llm', user_id=1).release()
+        bucket = scheduler._user_buckets[1]
+        self.assertEqual((bucket.rate * 60, bucket.capacity), (2, 2))
+
+    def test_work_costing_more_than_the_burst_is_charged_the_whole_burst(self):
+        scheduler = Scheduler()
+        scheduler.admit('llm', user_id=1, cost=5).release()
+        with self.assertRaises(AdmissionRejected) as rejected:
+            scheduler.admit('llm', user_id=1)
+        self.assertEqual(rejected.exception.status, 429)
@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from sqlalchemy.engine import make_url
+
+from dashboard.db_service import DatabaseService, DataSourceRegistry
+from dashboard.forms import DataSourceAdminForm
+from dashboard.models import DataSource
+
+UPDATED_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _data_source(pk, password='secret'):
+    return DataSource(pk=pk, name=f'source{pk}', host='db.example.com', port=5432, dbname='placements',
+                      user='reporting', password=password, updated_at=UPDATED_AT)
+
+
+class DatabaseServiceUrlTests(SimpleTestCase):
+    def test_credentials_are_escaped(self):
+        service = DatabaseService(_data_source(1, password='p@ss%41y'))
+        url = make_url(service.db_url.render_as_string(hide_password=False))
+        self.assertEqual((url.username, url.password, url.host, url.port, url.database),
+                         ('reporting', 'p@ss%41y', 'db.example.com', 5432, 'placements'))
+
+
+@override_settings(DATA_SOURCE_IDLE_SECONDS=60, DATA_SOURCE_MAX_ACTIVE=2)
+class DataSourceRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = DataSourceRegistry()
+        self.now = 1000.0
+        patcher = mock.patch('dashboard.db_service.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_source_reuses_its_service(self):
+        source = _data_source(1)
+        self.assertIs(self.registry.get(source), self.registry.get(source))
+
+    def test_idle_services_are_released(self):
+        idle = self.registry.get(_data_source(1))
+        self.now += 61
+        self.registry.get(_data_source(2))
+        self.assertTrue(idle._released)
+        self.assertIsNot(self.registry.get(_data_source(1)), idle)
+
+    def test_least_recently_used_beyond_max_active_is_released(self):
+        first, second = self.registry.get(_data_source(1)), self.registry.get(_data_source(2))
+        self.registry.get(_data_source(1))
+        self.registry.get(_data_source(3))
+        self.assertTrue(second._released)
+        self.assertFalse(first._released)
+
+    def test_edited_source_gets_a_new_service(self):
+        source = _data_source(1)
+        old = self.registry.get(source)
+        source.updated_at = datetime(2024, 2, 1, tzinfo=timezone.utc)
+        self.assertIsNot(self.registry.get(source), old)
+        self.assertTrue(old._released)
+
+    def test_released_service_borrows_the_registered_pool(self):
+        source = _data_source(1)
+        evicted = self.registry.get(source)
+        self.now += 61
+        self.registry.get(_data_source(2))
+        with mock.patch('dashboard.db_service.registry', self.registry):
+            engine = evicted.engine
+        self.assertIsNone(evicted._engine)
+        self.assertIs(engine, self.registry.get(source).engine)
+
+
+class DataSourceAdminFormTests(SimpleTestCase):
+    def _clean_password(self, instance, password):
+        form = DataSourceAdminForm(instance=instance)
+        form.cleaned_data = {'password': password}
+        return form.clean_password()
+
+    def test_blank_password_keeps_the_current_one(self):
+        self.assertEqual(self._clean_password(_data_source(1), ''), 'secret')
+
+    def test_new_password_replaces_the_current_one(self):
+        self.assertEqual(self._clean_password(_data_source(1), 'changed'), 'changed')
+
+    def test_blank_password_on_a_new_source_stays_blank(self):
+        self.assertEqual(self._clean_password(DataSource(), ''), '')
@@ -0,0 +1,99 @@
+import datetime
+import io
+import json
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.parquet as pq
+from django.test import SimpleTestCase
+
+from dashboard.export_service import negotiate_format, stream_export
+
+COLUMNS = ['name', 'package_lpa', 'average', 'offered_on', 'details', 'skills', 'scores']
+COLUMN_TYPES = [
+    (25, None, None),
+    (1700, 6, 2),               # numeric(6, 2)
+    (1700, 65535, 65535),       # numeric without a declared precision
+    (1082, None, None),
+    (3802, None, None),         # jsonb
+    (1009, None, None),         # text[]
+    (1007, None, None),         # int4[]
+]
+ROWS = [
+    ('Asha', Decimal('12.50'), Decimal('8.25'), datetime.date(2024, 3, 1), {'role': 'SDE', 'remote': True},
+     ['Python', 'SQL'], [1, None, 3]),
+    ('Ravi', None, None, None, None, None, None),
+]
+
+
+def _export(fmt, batch_size=1):
+    batches = [(COLUMNS, COLUMN_TYPES, ROWS[i:i + batch_size]) for i in range(0, len(ROWS), batch_size)]
+    return b''.join(stream_export(iter(batches), fmt))
+
+
+class NegotiateFormatTests(SimpleTestCase):
+    def test_explicit_format_wins(self):
+        self.assertEqual(negotiate_format('Parquet', 'application/json'), 'parquet')
+        self.assertIsNone(negotiate_format('xlsx'))
+
+    def test_highest_q_value_wins(self):
+        self.assertEqual(negotiate_format(accept='text/csv;q=0.5, application/vnd.apache.parquet'), 'parquet')
+        self.assertEqual(negotiate_format(accept='application/json;q=0.9, text/csv;q=0.9'), 'json')
+
+    def test_q_zero_excludes_a_type(self):
+        self.assertIsNone(negotiate_format(accept='text/csv;q=0'))
+        self.assertEqual(negotiate_format(accept='application/json;q=0, */*;q=0.1'), 'csv')
+
+    def test_wildcards_and_missing_header_fall_back_to_csv(self):
+        self.assertEqual(negotiate_format(accept='*/*'), 'csv')
+        self.assertEqual(negotiate_format(accept='text/*'), 'csv')
+        self.assertEqual(negotiate_format(), 'csv')
+        self.assertIsNone(negotiate_format(accept='image/png'))
+
+
+class StreamExportTests(SimpleTestCase):
+    def assert_arrow_table(self, table):
+        self.assertEqual(table.schema.field('package_lpa').type, pa.decimal128(6, 2))
+        self.assertEqual(table.schema.field('average').type, pa.float64())
+        self.assertEqual(table.schema.field('skills').type, pa.list_(pa.string()))
+        self.assertEqual(table.schema.field('scores').type, pa.list_(pa.int32()))
+        self.assertEqual(table.to_pylist(), [
+            {'name': 'Asha', 'package_lpa': Decimal('12.50'), 'average': 8.25, 'offered_on': datetime.date(2024, 3, 1),
+             'details': '{"role": "SDE", "remote": true}', 'skills': ['Python', 'SQL'], 'scores': [1, None, 3]},
+            {'name': 'Ravi', 'package_lpa': None, 'average': None, 'offered_on': None, 'details': None,
+             'skills': None, 'scores': None},
+        ])
+
+    def test_arrow_round_trip(self):
+        self.assert_arrow_table(pa.ipc.open_stream(_export('arrow')).read_all())
+
+    def test_parquet_round_trip(self):
+        self.assert_arrow_table(pq.read_table(io.BytesIO(_export('parquet'))))
+
+    def test_csv_round_trip(self):
+        table = pyarrow.csv.read_csv(io.BytesIO(_export('csv')))
+        self.assertEqual(table.column_names, COLUMNS)
+        first = {name: table.column(name)[0].as_py() for name in COLUMNS}
+        self.assertEqual(first['name'], 'Asha')
+        self.assertEqual(first['package_lpa'], 12.5)
+        self.assertEqual(first['offered_on'], datetime.date(2024, 3, 1))
+        self.assertEqual(json.loads(first['details']), {'role': 'SDE', 'remote': True})
+        self.assertEqual(json.loads(first['skills']), ['Python', 'SQL'])
+        self.assertEqual(json.loads(first['scores']), [1, None, 3])
+
+    def test_json_round_trip(self):
+        exported = json.loads(_export('json'))
+        self.assertEqual(exported['columns'], COLUMNS)
+        self.assertEqual(len(exported['batches']), 2)
+        first, second = exported['batches']
+        self.assertEqual(first, {
+            'name': ['Asha'], 'package_lpa': [12.5], 'average': [8.25], 'offered_on': ['2024-03-01'],
+            'details': [{'role': 'SDE', 'remote': True}], 'skills': [['Python', 'SQL']], 'scores': [[1, None, 3]],
+        })
+        self.assertEqual(second['package_lpa'], [None])
+
+    def test_empty_result_keeps_its_columns(self):
+        batches = iter([(COLUMNS, COLUMN_TYPES, [])])
+        table = pa.ipc.open_stream(b''.join(stream_export(batches, 'arrow'))).read_all()
+        self.assertEqual((table.column_names, table.num_rows), (COLUMNS, 0))
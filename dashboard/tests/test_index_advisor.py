@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase
+
+from dashboard.index_advisor_service import Candidate, extract_predicates
+
+SCHEMA_COLUMNS = {
+    'students': {'student_id', 'name', 'gender', 'branch', 'cgpa', 'passing_year'},
+    'offers': {'offer_id', 'student_id', 'company_id', 'package_lpa', 'offer_day', 'offer_month', 'offer_year'},
+    'companies': {'company_id', 'name', 'industry', 'offer_type'},
+    'skills': {'skill_id', 'name'},
+}
+
+
+class ExtractPredicatesTests(SimpleTestCase):
+    def test_joins_equality_and_range_through_aliases(self):
+        self.assertEqual(
+            extract_predicates(
+                "SELECT s.name FROM students s JOIN offers o ON s.student_id = o.student_id "
+                "WHERE o.offer_year = 2023 AND s.branch = 'CSE' AND s.cgpa > 8",
+                SCHEMA_COLUMNS
+            ),
+            {('students', 'student_id', 'join'), ('offers', 'student_id', 'join'),
+             ('offers', 'offer_year', 'equality'), ('students', 'branch', 'equality'),
+             ('students', 'cgpa', 'range')}
+        )
+
+    def test_unqualified_columns_resolve_to_their_only_table(self):
+        self.assertEqual(
+            extract_predicates("SELECT * FROM offers WHERE company_id IN (1, 2) AND offer_year BETWEEN 2020 AND 2022",
+                               SCHEMA_COLUMNS),
+            {('offers', 'company_id', 'equality'), ('offers', 'offer_year', 'range')}
+        )
+
+    def test_ambiguous_and_negated_predicates_are_ignored(self):
+        self.assertEqual(
+            extract_predicates("SELECT * FROM offers o JOIN students s ON TRUE "
+                               "WHERE student_id = 3 AND s.branch NOT IN ('IT')", SCHEMA_COLUMNS),
+            set()
+        )
+
+    def test_order_and_group_by_columns_are_not_predicates(self):
+        self.assertEqual(
+            extract_predicates("SELECT branch, COUNT(*) FROM students GROUP BY branch ORDER BY 2", SCHEMA_COLUMNS),
+            set()
+        )
+
+
+class CandidateTests(SimpleTestCase):
+    def test_names_fit_postgres_identifiers_and_stay_distinct(self):
+        table = 'student_placement_offers_by_company'
+        first = Candidate(table, ['company_id', 'offer_year', 'offer_month'])
+        second = Candidate(table, ['company_id', 'offer_year', 'offer_day'])
+        self.assertLessEqual(len(first.name), 63)
+        self.assertNotEqual(first.name, second.name)
+        self.assertEqual(first.name, Candidate(table, ['company_id', 'offer_year', 'offer_month']).name)
+
+    def test_definition_quotes_identifiers(self):
+        candidate = Candidate('offers', ['offer_year', 'package_lpa'])
+        self.assertEqual(candidate.definition(concurrently=True),
+                         f'CREATE INDEX CONCURRENTLY "{candidate.name}" ON "offers" ("offer_year", "package_lpa")')
+
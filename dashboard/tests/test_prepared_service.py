@@ -0,0 +1,49 @@
+from django.test import SimpleTestCase
+
+from dashboard.prepared_service import parameterize
+
+
+class ParameterizeTests(SimpleTestCase):
+    def test_string_and_number_literals_become_parameters(self):
+        self.assertEqual(
+            parameterize("SELECT name FROM students WHERE branch = 'CSE' AND cgpa > 8.5 LIMIT 10;"),
+            ("SELECT name FROM students WHERE branch = $1 AND cgpa > $2 LIMIT $3",
+             ['CSE', '8.5', 10], ['unknown', 'numeric', 'int'])
+        )
+
+    def test_positional_order_and_group_by_stay_literal(self):
+        self.assertEqual(
+            parameterize("SELECT branch, COUNT(*) FROM students WHERE passing_year = 2024 GROUP BY 1 ORDER BY 2 DESC"),
+            ("SELECT branch, COUNT(*) FROM students WHERE passing_year = $1 GROUP BY 1 ORDER BY 2 DESC",
+             [2024], ['int'])
+        )
+
+    def test_numbers_inside_an_order_by_subquery_are_values(self):
+        self.assertEqual(
+            parameterize("SELECT branch FROM students ORDER BY (SELECT 1) LIMIT 5"),
+            ("SELECT branch FROM students ORDER BY (SELECT $1) LIMIT $2", [1, 5], ['int', 'int'])
+        )
+
+    def test_type_modifiers_and_typed_literals_stay_literal(self):
+        self.assertEqual(
+            parameterize("SELECT CAST(cgpa AS numeric(4, 2)) FROM students WHERE student_id = 3000000000"),
+            ("SELECT CAST(cgpa AS numeric(4, 2)) FROM students WHERE student_id = $1", [3000000000], ['bigint'])
+        )
+        self.assertEqual(
+            parameterize("SELECT * FROM offers WHERE d > DATE '2024-01-01' AND name = 'O''Brien'"),
+            ("SELECT * FROM offers WHERE d > DATE '2024-01-01' AND name = $1", ["O'Brien"], ['unknown'])
+        )
+
+    def test_integers_beyond_int8_are_numeric(self):
+        self.assertEqual(
+            parameterize("SELECT * FROM offers WHERE package_lpa > 99999999999999999999"),
+            ("SELECT * FROM offers WHERE package_lpa > $1", [99999999999999999999], ['numeric'])
+        )
+        self.assertEqual(parameterize("SELECT 9223372036854775807")[2], ['bigint'])
+        self.assertEqual(parameterize("SELECT 9223372036854775808")[2], ['numeric'])
+
+    def test_unsafe_statements_are_not_rewritten(self):
+        self.assertIsNone(parameterize("SELECT * FROM students WHERE name = E'a\\nb'"))
+        self.assertIsNone(parameterize("SELECT 1 -- comment"))
+        self.assertIsNone(parameterize("SELECT $1"))
+        self.assertIsNone(parameterize("DELETE FROM students"))
@@ -0,0 +1,141 @@
+import threading
+
+from django.test import SimpleTestCase, override_settings
+
+from dashboard.speculative_service import NOT_RELEVANT, SpeculativeRunner
+from dashboard.sql_utils import validate_sql
+
+WAIT_SECONDS = 5
+
+
+class FakeLLM:
+    """Returns the SQL listed for each temperature, or raises it when it is an exception"""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def generate_sql(self, natural_language, prompt_context, temperature, value_hints=None):
+        response = self.responses[temperature]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class FakeDatabase:
+    """
+    Runs statements the way DatabaseService.execute_query does: on_backend gets a pid
+    before the statement runs and None after. Statements in `errors` fail; a
+    statement in `before_start` waits for its event before taking a backend, one in
+    `running` sets its event once started and holds its backend until cancel_backend
+    is called for it.
+    """
+
+    def __init__(self, errors=(), before_start=None, running=None):
+        self.errors = set(errors)
+        self.before_start = before_start or {}
+        self.running = running or {}
+        self._cancel = {sql: threading.Event() for sql in self.running}
+        self.pids = {}
+        self.started = []
+        self.cancelled = []
+        self.finished = {}
+        self._lock = threading.Lock()
+
+    def execute_query(self, sql_query, timeout=None, on_backend=None):
+        self.finished[sql_query] = threading.Event()
+        try:
+            if sql_query in self.before_start:
+                self.before_start[sql_query].wait(WAIT_SECONDS)
+            with self._lock:
+                pid = self.pids[sql_query] = 100 + len(self.pids)
+            on_backend(pid)
+            try:
+                self.started.append(sql_query)
+                if sql_query in self.running:
+                    self.running[sql_query].set()
+                    self._cancel[sql_query].wait(WAIT_SECONDS)
+                    return {'success': False, 'error': 'canceling statement due to user request'}
+                if sql_query in self.errors:
+                    return {'success': False, 'error': f'error in {sql_query}'}
+                return {'success': True, 'data': [], 'columns': []}
+            finally:
+                on_backend(None)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+        finally:
+            self.finished[sql_query].set()
+
+    def cancel_backend(self, pid):
+        self.cancelled.append(pid)
+        for sql, event in self._cancel.items():
+            if self.pids.get(sql) == pid:
+                event.set()
+        return True
+
+
+class ValidateSqlTests(SimpleTestCase):
+    def test_select_and_with_are_cleaned(self):
+        self.assertEqual(validate_sql("  SELECT * FROM students;\n"), "SELECT * FROM students")
+        self.assertEqual(validate_sql("with t AS (SELECT 1) SELECT * FROM t"), "with t AS (SELECT 1) SELECT * FROM t")
+
+    def test_semicolons_and_parentheses_inside_strings_are_allowed(self):
+        sql = "SELECT * FROM companies WHERE name = 'a;b(' AND industry = 'IT'"
+        self.assertEqual(validate_sql(sql), sql)
+
+    def test_unusable_candidates_are_rejected(self):
+        for sql in (None, '', NOT_RELEVANT, "DELETE FROM students", "SELECT 1; DROP TABLE students",
+                    "SELECT * FROM students WHERE name = 'x", "SELECT COUNT(* FROM students"):
+            with self.subTest(sql=sql):
+                self.assertIsNone(validate_sql(sql))
+
+
+@override_settings(SPECULATIVE_CANDIDATES=3, SPECULATIVE_TEMPERATURES=[0.1, 0.4, 0.7],
+                   SPECULATIVE_LLM_TIMEOUT_SECONDS=WAIT_SECONDS, SPECULATIVE_TIMEOUT_SECONDS=WAIT_SECONDS)
+class SpeculativeRunnerTests(SimpleTestCase):
+    def _run(self, responses, db):
+        generated = threading.Event()
+        runner = SpeculativeRunner(FakeLLM(responses), db)
+        sql, result, stats = runner.run("question", "schema", on_generated=generated.set)
+        self.assertTrue(generated.wait(WAIT_SECONDS))
+        return sql, result, stats
+
+    def test_first_successful_candidate_wins(self):
+        db = FakeDatabase(errors={'SELECT 1'})
+        sql, result, stats = self._run({0.1: 'SELECT 1', 0.4: 'SELECT 2', 0.7: None}, db)
+        self.assertEqual((sql, result['success'], stats['winner']), ('SELECT 2', True, 1))
+
+    def test_duplicate_candidates_run_once(self):
+        db = FakeDatabase(errors={'SELECT 1'})
+        _, _, stats = self._run({0.1: 'SELECT 1', 0.4: 'select  1;', 0.7: 'SELECT 1'}, db)
+        self.assertEqual((stats['generated'], stats['valid'], stats['executed']), (3, 1, 1))
+        self.assertEqual(len(db.started), 1)
+
+    def test_first_failure_is_returned_when_no_candidate_succeeds(self):
+        db = FakeDatabase(errors={'SELECT 1'})
+        sql, result, stats = self._run({0.1: 'SELECT 1', 0.4: 'DROP TABLE students', 0.7: RuntimeError('503')}, db)
+        self.assertEqual((sql, result), ('SELECT 1', {'success': False, 'error': 'error in SELECT 1'}))
+        self.assertEqual((stats['generated'], stats['valid'], stats['winner']), (2, 1, None))
+
+    def test_no_valid_candidate_is_not_relevant(self):
+        sql, result, _ = self._run({0.1: NOT_RELEVANT, 0.4: None, 0.7: RuntimeError('503')}, FakeDatabase())
+        self.assertEqual(sql, NOT_RELEVANT)
+        self.assertFalse(result['success'])
+
+    def test_loser_that_has_not_started_never_runs(self):
+        start_loser = threading.Event()
+        db = FakeDatabase(before_start={'SELECT 1': start_loser})
+        sql, _, _ = self._run({0.1: 'SELECT 1', 0.4: 'SELECT 2', 0.7: None}, db)
+        self.assertEqual(sql, 'SELECT 2')
+
+        start_loser.set()
+        self.assertTrue(db.finished['SELECT 1'].wait(WAIT_SECONDS))
+        self.assertNotIn('SELECT 1', db.started)
+        self.assertEqual(db.cancelled, [])
+
+    def test_running_loser_is_cancelled(self):
+        loser_started = threading.Event()
+        db = FakeDatabase(before_start={'SELECT 2': loser_started}, running={'SELECT 1': loser_started})
+        sql, _, _ = self._run({0.1: 'SELECT 1', 0.4: 'SELECT 2', 0.7: None}, db)
+        self.assertEqual(sql, 'SELECT 2')
+        self.assertEqual(db.cancelled, [db.pids['SELECT 1']])
+        self.assertTrue(db.finished['SELECT 1'].wait(WAIT_SECONDS))
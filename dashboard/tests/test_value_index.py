@@ -0,0 +1,80 @@
+from django.test import SimpleTestCase
+
+from dashboard.sql_utils import table_aliases
+from dashboard.value_index_service import ValueIndex, _Snapshot
+
+SCHEMA_COLUMNS = {
+    'students': {'student_id', 'name', 'gender', 'branch', 'cgpa', 'passing_year'},
+    'offers': {'offer_id', 'student_id', 'company_id', 'package_lpa', 'offer_day', 'offer_month', 'offer_year'},
+    'companies': {'company_id', 'name', 'industry', 'offer_type'},
+    'skills': {'skill_id', 'name'},
+}
+
+
+class TableAliasesTests(SimpleTestCase):
+    def test_aliases_from_joins_lists_and_subqueries(self):
+        self.assertEqual(
+            table_aliases(
+                "SELECT * FROM public.students AS s JOIN offers o ON s.student_id = o.student_id, companies c "
+                "WHERE c.name IN (SELECT name FROM skills sk)",
+                SCHEMA_COLUMNS
+            ),
+            {'students': 'students', 's': 'students', 'offers': 'offers', 'o': 'offers',
+             'companies': 'companies', 'c': 'companies', 'skills': 'skills', 'sk': 'skills'}
+        )
+
+    def test_from_list_after_a_subquery(self):
+        self.assertEqual(
+            table_aliases("SELECT * FROM (SELECT company_id FROM offers) sub, students WHERE TRUE", SCHEMA_COLUMNS),
+            {'offers': 'offers', 'students': 'students'}
+        )
+
+    def test_keywords_are_not_aliases(self):
+        self.assertEqual(table_aliases("SELECT * FROM students WHERE branch = 'IT'", SCHEMA_COLUMNS),
+                         {'students': 'students'})
+
+
+def _value_index(columns):
+    table_columns = {table: frozenset(names) for table, names in SCHEMA_COLUMNS.items()}
+    index = ValueIndex(db_service=None)
+    index._snapshot = _Snapshot(columns, table_columns)
+    return index
+
+
+class ValueIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = _value_index({
+            ('students', 'branch'): ('CSE', 'ECE', 'IT', 'ME'),
+            ('companies', 'name'): ('Amazon', 'Google', 'Microsoft'),
+            ('skills', 'name'): ('Machine Learning', 'Python', 'SQL'),
+        })
+
+    def test_literal_is_fixed_from_its_own_table(self):
+        self.assertEqual(self.index.fix_literals("SELECT * FROM companies c WHERE c.name = 'googl'"),
+                         "SELECT * FROM companies c WHERE c.name = 'Google'")
+        self.assertEqual(self.index.fix_literals("SELECT * FROM students WHERE branch IN ('cse', 'it')"),
+                         "SELECT * FROM students WHERE branch IN ('CSE', 'IT')")
+
+    def test_literal_is_not_fixed_from_another_table(self):
+        sql = "SELECT * FROM students s WHERE s.name = 'Googl'"
+        self.assertEqual(self.index.fix_literals(sql), sql)
+        sql = "SELECT * FROM companies c WHERE c.name = 'machine learning'"
+        self.assertEqual(self.index.fix_literals(sql), sql)
+
+    def test_ambiguous_unqualified_column_is_left_alone(self):
+        sql = "SELECT * FROM companies c JOIN skills s ON TRUE WHERE name = 'googl'"
+        self.assertEqual(self.index.fix_literals(sql), sql)
+
+    def test_unknown_qualifier_is_left_alone(self):
+        sql = "SELECT * FROM (SELECT name FROM companies) x WHERE x.name = 'googl'"
+        self.assertEqual(self.index.fix_literals(sql), sql)
+
+    def test_exact_values_are_matched_before_fuzzy_phrases(self):
+        self.assertEqual(
+            set(self.index.match_question("How many offers from google in Machine learning")),
+            {('companies', 'name', 'Google'), ('skills', 'name', 'Machine Learning')}
+        )
+
+    def test_short_values_must_match_case(self):
+        self.assertEqual(self.index.match_question("is it hard"), [])
+        self.assertEqual(self.index.match_question("students in IT"), [('students', 'branch', 'IT')])
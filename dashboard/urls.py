@@ -14,8 +14,12 @@ urlpatterns = [
     path('query/', views.query_view, name='query'),
     # path('query-page/', views.query_page, name='query-page'),
     path('process-query/', views.process_query, name='process_query'),
+    path('query-results/<int:query_id>/', views.query_results, name='query_results'),
     path('history/', views.history_view, name='history'),
     path('feedback/', views.save_feedback, name='save_feedback'),
-    path('export-csv/<int:query_id/', views.export_csv, name='export_csv'),
-    path('rerun-query//', views.rerun_query, name='rerun_query'),
+    path('export-csv/<int:query_id>/', views.export_csv, name='export_csv'),
+    path('export/<int:query_id>/', views.export_query, name='export_query'),
+    path('export/<int:query_id>/<str:fmt>/', views.export_query, name='export_query_format'),
+    path('rerun-query/<int:query_id>/', views.rerun_query, name='rerun_query'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
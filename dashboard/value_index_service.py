@@ -0,0 +1,294 @@
+import re
+import sys
+import threading
+import time
+from array import array
+
+from django.conf import settings
+
+from .sql_utils import table_aliases
+
+# information_schema data types whose values are worth indexing; enums report USER-DEFINED
+TEXT_TYPES = ('text', 'character varying', 'character', 'USER-DEFINED')
+
+WORD_RE = re.compile(r"[\w+#.-]+")
+COMPARISON_RE = re.compile(r"""((?:"?\w+"?\.)?"?(\w+)"?)\s*(=|<>|!=)\s*'((?:[^']|'')*)'""")
+IN_LIST_RE = re.compile(r"""((?:"?\w+"?\.)?"?(\w+)"?)\s+((?:NOT\s+)?IN)\s*\(([^)]*)\)""", re.IGNORECASE)
+LITERAL_RE = re.compile(r"'((?:[^']|'')*)'")
+
+
+def trigrams(value):
+    """pg_trgm style trigrams of a lower-cased, space padded string"""
+    padded = f"  {value.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _quote(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _identifier(name):
+    """Identifier as PostgreSQL resolves it: quoted names kept, others lower-cased"""
+    if name.startswith('"') and name.endswith('"'):
+        return name[1:-1].replace('""', '"')
+    return name.lower()
+
+
+def _overlap(word, value_grams):
+    """Share of a word's trigrams that also occur in a value"""
+    grams = trigrams(word)
+    return len(grams & value_grams) / len(grams)
+
+
+class _Snapshot:
+    """Immutable lookup structures built from the per-column value lists"""
+
+    def __init__(self, columns, table_columns=None):
+        self.table_columns = table_columns or {}    # table -> frozenset of all its column names
+        self.columns = []                 # column id -> (table, column)
+        self.values = []                  # value id -> stored value
+        self.value_columns = array('I')   # value id -> column id
+        self.by_lower = {}                # lower-cased value -> [value id]
+        self.by_name = {}                 # column name -> [column id]
+        self.postings = {}                # trigram -> array of value ids
+        self.column_values = []           # column id -> frozenset of stored values
+
+        for (table, column), values in sorted(columns.items()):
+            column_id = len(self.columns)
+            self.columns.append((table, column))
+            self.column_values.append(frozenset(values))
+            self.by_name.setdefault(column.lower(), []).append(column_id)
+            for value in values:
+                value_id = len(self.values)
+                self.values.append(value)
+                self.value_columns.append(column_id)
+                self.by_lower.setdefault(value.lower(), []).append(value_id)
+                for gram in trigrams(value):
+                    self.postings.setdefault(gram, array('I')).append(value_id)
+
+    def similar(self, phrase, column_ids=None, min_similarity=None):
+        """Best (similarity, value id) for a phrase, optionally limited to some columns"""
+        min_similarity = settings.VALUE_INDEX_MIN_SIMILARITY if min_similarity is None else min_similarity
+        grams = trigrams(phrase)
+        shared = {}
+        for gram in grams:
+            for value_id in self.postings.get(gram, ()):
+                shared[value_id] = shared.get(value_id, 0) + 1
+
+        best = (0.0, None)
+        for value_id, count in shared.items():
+            if column_ids is not None and self.value_columns[value_id] not in column_ids:
+                continue
+            union = len(grams) + len(trigrams(self.values[value_id])) - count
+            similarity = count / union if union else 0.0
+            if similarity > best[0]:
+                best = (similarity, value_id)
+        return best if best[0] >= min_similarity else (0.0, None)
+
+
+class ValueIndex:
+    """
+    In-memory index of the distinct values of low-cardinality text and enum
+    columns of one data source. Used to point the LLM at exact stored values
+    before prompting and to correct string literals in the generated SQL.
+
+    Tables are re-read only when their pg_stat_user_tables write counters have
+    moved since the last refresh.
+    """
+
+    def __init__(self, db_service):
+        self.db_service = db_service
+        self._columns = {}        # (table, column) -> tuple of distinct values
+        self._versions = {}       # table -> write counter at last refresh
+        self._snapshot = _Snapshot({})
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def refresh_if_stale(self, wait=False):
+        """
+        Refresh in a background thread once the snapshot is older than
+        VALUE_INDEX_REFRESH_SECONDS, serving the current one meanwhile (empty
+        before the first refresh). With wait=True refresh in this thread.
+        """
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at <= settings.VALUE_INDEX_REFRESH_SECONDS:
+            return self
+        if wait:
+            with self._lock:
+                self.refresh()
+        elif self._lock.acquire(blocking=False):
+            threading.Thread(target=self._refresh_and_release, name='value-index-refresh', daemon=True).start()
+        return self
+
+    def _refresh_and_release(self):
+        try:
+            self.refresh()
+        finally:
+            self._lock.release()
+
+    def refresh(self):
+        """
+        Re-read the values of tables written to since the last refresh
+        """
+        from sqlalchemy import text
+
+        schema_info, _ = self.db_service.get_schema()
+        max_distinct = settings.VALUE_INDEX_MAX_DISTINCT
+
+        try:
+            with self.db_service.engine.connect() as conn:
+                versions = dict(conn.execute(text("""
+                    SELECT relname, n_tup_ins + n_tup_upd + n_tup_del
+                    FROM pg_stat_user_tables
+                    WHERE schemaname = 'public'
+                """)).fetchall())
+
+                # Planner estimates of distinct values, so high-cardinality columns are never scanned
+                estimates = {}
+                for table, column, n_distinct, reltuples in conn.execute(text("""
+                    SELECT s.tablename, s.attname, s.n_distinct, c.reltuples
+                    FROM pg_stats s
+                    JOIN pg_namespace n ON n.nspname = s.schemaname
+                    JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+                    WHERE s.schemaname = 'public'
+                """)):
+                    # A negative n_distinct is a fraction of the row count
+                    estimates[(table, column)] = n_distinct if n_distinct >= 0 else -n_distinct * max(reltuples, 0)
+
+                columns = {key: values for key, values in self._columns.items() if key[0] in versions}
+                for table in schema_info:
+                    name = table['table']
+                    if name in self._versions and self._versions.get(name) == versions.get(name):
+                        continue
+                    for column in table['columns']:
+                        if column['type'] not in TEXT_TYPES:
+                            continue
+                        if estimates.get((name, column['name']), 0) > max_distinct:
+                            columns.pop((name, column['name']), None)
+                            continue
+                        rows = conn.exec_driver_sql(
+                            f'SELECT DISTINCT "{column["name"]}"::text FROM "{name}" '
+                            f'WHERE "{column["name"]}" IS NOT NULL LIMIT {max_distinct + 1}'
+                        ).fetchall()
+                        if len(rows) > max_distinct:
+                            # Too many distinct values to be a useful literal vocabulary
+                            columns.pop((name, column['name']), None)
+                            continue
+                        columns[(name, column['name'])] = tuple(sorted(sys.intern(row[0]) for row in rows))
+        except Exception as e:
+            print(f"Error refreshing value index: {e}")
+            self._refreshed_at = time.monotonic()
+            return
+
+        table_columns = {
+            table['table']: frozenset(column['name'].lower() for column in table['columns'])
+            for table in schema_info
+        }
+        self._columns = columns
+        self._versions = versions
+        self._snapshot = _Snapshot(columns, table_columns)
+        self._refreshed_at = time.monotonic()
+
+    def match_question(self, question):
+        """
+        Stored values mentioned in the question, as (table, column, value) tuples
+        """
+        snapshot = self._snapshot
+        words = WORD_RE.findall(question)
+        matches = []
+        seen = set()
+        covered = set()           # word positions already explained by a match
+        max_words = settings.VALUE_INDEX_MAX_PHRASE_WORDS
+
+        # Exact matches at every phrase length come first, so a long fuzzy
+        # phrase cannot swallow a value that the question spells out exactly
+        for fuzzy in (False, True):
+            for size in range(max_words, 0, -1):
+                for start in range(len(words) - size + 1):
+                    positions = set(range(start, start + size))
+                    if positions & covered:
+                        continue
+                    phrase = ' '.join(words[start:start + size])
+                    if not fuzzy:
+                        value_ids = snapshot.by_lower.get(phrase.lower(), [])
+                        # Short words only count when they match exactly, e.g. "IT" but not "it"
+                        if len(phrase) <= 3:
+                            value_ids = [v for v in value_ids if snapshot.values[v] == phrase]
+                        aligned = positions
+                    else:
+                        if len(phrase) < 5:
+                            continue
+                        _, value_id = snapshot.similar(phrase)
+                        # Short values like "IT" only ever match exactly
+                        if value_id is None or len(snapshot.values[value_id]) <= 3:
+                            continue
+                        # Only the words that resemble the value are explained by it
+                        value_grams = trigrams(snapshot.values[value_id])
+                        aligned = {p for p in positions if _overlap(words[p], value_grams) >= 0.5}
+                        value_ids = [value_id] if aligned else []
+
+                    if value_ids:
+                        covered |= aligned
+                    for value_id in value_ids:
+                        table, column = snapshot.columns[snapshot.value_columns[value_id]]
+                        match = (table, column, snapshot.values[value_id])
+                        if match not in seen:
+                            seen.add(match)
+                            matches.append(match)
+
+        return matches[:settings.VALUE_INDEX_MAX_HINTS]
+
+    def fix_literals(self, sql_query):
+        """
+        Replace string literals compared against an indexed column with the
+        closest stored value of that column. The column's table comes from the
+        qualifier and the statement's FROM and JOIN aliases; unqualified
+        columns that more than one table of the statement has are left alone.
+        """
+        snapshot = self._snapshot
+        if not snapshot.values or not sql_query:
+            return sql_query
+
+        aliases = table_aliases(sql_query, snapshot.table_columns)
+        statement_tables = set(aliases.values())
+
+        def resolve(column_ref, column_name, literal):
+            column_name = column_name.lower()
+            if '.' in column_ref:
+                table = aliases.get(_identifier(column_ref.rsplit('.', 1)[0]))
+            else:
+                owners = [t for t in statement_tables if column_name in snapshot.table_columns[t]]
+                table = owners[0] if len(owners) == 1 else None
+            column_ids = [c for c in snapshot.by_name.get(column_name, []) if snapshot.columns[c][0] == table]
+            if not column_ids:
+                return None
+            if any(literal in snapshot.column_values[c] for c in column_ids):
+                return None
+            for value_id in snapshot.by_lower.get(literal.lower(), []):
+                if snapshot.value_columns[value_id] in column_ids:
+                    return snapshot.values[value_id]
+            _, value_id = snapshot.similar(literal, set(column_ids))
+            return snapshot.values[value_id] if value_id is not None else None
+
+        def fix_comparison(match):
+            column_ref, column_name, operator, literal = match.groups()
+            fixed = resolve(column_ref, column_name, literal.replace("''", "'"))
+            if fixed is None:
+                return match.group(0)
+            return f"{column_ref} {operator} {_quote(fixed)}"
+
+        def fix_in_list(match):
+            column_ref, column_name, operator, items = match.groups()
+
+            def fix_item(item):
+                fixed = resolve(column_ref, column_name, item.group(1).replace("''", "'"))
+                return item.group(0) if fixed is None else _quote(fixed)
+
+            return f"{column_ref} {operator} ({LITERAL_RE.sub(fix_item, items)})"
+
+        sql_query = COMPARISON_RE.sub(fix_comparison, sql_query)
+        return IN_LIST_RE.sub(fix_in_list, sql_query)
+
+
+def format_value_hints(matches):
+    """Prompt lines for the values found by ValueIndex.match_question"""
+    return "\n".join(f"- {table}.{column} = {_quote(value)}" for table, column, value in matches)
@@ -1,16 +1,26 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.forms import AuthenticationForm
+from django.conf import settings
+from django.db import models
+from django.db.models.expressions import RawSQL
+import itertools
 import json
 import logging
 
-from .models import Query, QueryFeedback
+from .models import DataSource, Query, QueryFeedback
 from .forms import RegistrationForm, QueryForm, QueryFeedbackForm
 from .llm_service import LLMService
-from .db_service import DatabaseService
+from .db_service import get_database_service
+from .speculative_service import SpeculativeRunner
+from .value_index_service import format_value_hints
+from .export_service import EXPORT_FORMATS, negotiate_format, stream_export
+from .admission_service import AdmissionRejected, ReleasingIterator, scheduler, EXPORT, RERUN
+from . import metrics, prepared_service
 
 def index(request):
     """Landing page view"""
@@ -48,10 +58,18 @@ def login_view(request):
 @login_required
 def query_view(request):
     """Main query interface view"""
-    db_service = DatabaseService()
-    schema_info, schema_str = db_service.get_schema_info()
+    data_source = None
+    if request.GET.get('source'):
+        try:
+            source_id = int(request.GET['source'])
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid data source'}, status=400)
+        data_source = get_object_or_404(DataSource, id=source_id, is_active=True)
+
+    db_service = get_database_service(data_source)
+    schema_info, schema_str = db_service.get_schema()
     
-    form = QueryForm()
+    form = QueryForm(initial={'data_source': data_source})
     
     context = {
         'form': form,
@@ -72,22 +90,46 @@ def process_query(request):
     
     if form.is_valid():
         natural_language = form.cleaned_data['query']
+        data_source = form.cleaned_data.get('data_source')
         
-        db_service = DatabaseService()
+        db_service = get_database_service(data_source)
         llm_service = LLMService()
         
         # Get schema information for context
-        schema_info, schema_str = db_service.get_schema_info()
+        schema_info, schema_str = db_service.get_schema()
         
         # Generate SQL using LLM
         try:
-            sql_query = llm_service.generate_sql(natural_language, schema_str)
-            
-            # Execute SQL query
-            result = db_service.execute_query(sql_query)
+            # Point the model at exact stored values, then correct any literal it still got wrong
+            value_index = db_service.get_value_index()
+            value_hints = format_value_hints(value_index.match_question(natural_language)) if value_index else None
+
+            if form.cleaned_data.get('speculative'):
+                # Race several candidates and keep the first that executes. Each candidate takes
+                # an SQL slot and an LLM slot, the latter held until abandoned LLM calls finish
+                runner = SpeculativeRunner(llm_service, db_service, value_index=value_index)
+                candidates = len(runner.temperatures)
+                llm_ticket = scheduler.admit('llm', request.user.id, cost=candidates)
+                try:
+                    with scheduler.admit('sql', request.user.id, cost=candidates):
+                        sql_query, result, _ = runner.run(natural_language, db_service.get_prompt_context(),
+                                                          value_hints, on_generated=llm_ticket.release)
+                except Exception:
+                    llm_ticket.release()
+                    raise
+            else:
+                with scheduler.admit('llm', request.user.id):
+                    sql_query = llm_service.generate_sql(natural_language, db_service.get_prompt_context(), value_hints=value_hints)
+                if value_index:
+                    sql_query = value_index.fix_literals(sql_query)
+                
+                # Execute SQL query
+                with scheduler.admit('sql', request.user.id):
+                    result = db_service.execute_query(sql_query)
             # Save query to history
             query = Query.objects.create(
                 user=request.user,
+                data_source=data_source,
                 natural_language=natural_language,
                 sql_query=sql_query,
                 result = result 
@@ -95,7 +137,7 @@ def process_query(request):
             
             # Log the generated SQL and result
             logger.info(f"Generated SQL: {sql_query}")
-            logger.info(f"Query Result: {result}")
+            logger.info(f"Query Result: {len(result.get('data', []))} rows")
             
             # return JsonResponse({
             #     'success': True,
@@ -108,10 +150,15 @@ def process_query(request):
                 'form': form, 
                 'schema_info': schema_info,
                 'sql_query': sql_query,
-                'result' : result ,
+                'result' : _result_summary(result),
+                'chunk_size' : settings.RESULT_CHUNK_SIZE,
                 'pq' : pq,
+                'query_id' : query.id,
+                'data_source' : data_source,
                 'natural_language' : 'natural_language'
             })
+        except AdmissionRejected as e:
+            return _rejected(e)
         except Exception as e:
             logger.error(f"Error processing query: {str(e)}")
             return JsonResponse({
@@ -127,10 +174,10 @@ def process_query(request):
 def query_page(request):
     """Render the query page with the form and schema information"""
     form = QueryForm()
-    db_service = DatabaseService()
+    db_service = get_database_service()
     
     # Get schema information for the template
-    schema_info, _ = db_service.get_schema_info()
+    schema_info, _ = db_service.get_schema()
     
     return render(request, 'dashboard/query.html', {
         'form': form,
@@ -140,7 +187,7 @@ def query_page(request):
 @login_required
 def history_view(request):
     """View query history"""
-    queries = Query.objects.filter(user=request.user)
+    queries = Query.objects.filter(user=request.user).select_related('data_source')
     return render(request, 'dashboard/history.html', {'queries': queries})
 
 
@@ -149,9 +196,6 @@ from django.shortcuts import redirect
 @login_required
 def save_feedback(request):
     """Handle query form display and feedback saving"""
-    db_service = DatabaseService()
-    schema_info, _ = db_service.get_schema_info()
-
     if request.method == 'POST':
         form = QueryFeedbackForm(request.POST)
         if form.is_valid():
@@ -162,6 +206,7 @@ def save_feedback(request):
 
             QueryFeedback.objects.create(
                 query_user=request.user,
+                data_source=feedback_data.get('data_source'),
                 help_full=feedback_data.get('help_full', False),
                 nlp_given=nlp_given,
                 query_sql=feedback_data['query_sql'],
@@ -173,6 +218,9 @@ def save_feedback(request):
     else:
         form = QueryFeedbackForm()
 
+    db_service = get_database_service()
+    schema_info, _ = db_service.get_schema()
+
     return render(request, 'dashboard/query.html', {
         'form': form,
         'schema_info': schema_info
@@ -182,29 +230,130 @@ def save_feedback(request):
 
 
 
+def _rejected(error):
+    """429 or 503 response for work turned away by admission control"""
+    response = JsonResponse({
+        'success': False,
+        'error': str(error),
+        'retry_after': error.retry_after
+    }, status=error.status)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+def _result_summary(result):
+    """Column names and row count for the result table shell; rows load from query_results"""
+    return {
+        'success': result.get('success', False),
+        'error': result.get('error'),
+        'columns': result.get('columns', []),
+        'row_count': len(result.get('data', [])),
+    }
+
+@login_required
+def query_results(request, query_id):
+    """Return a fixed-size chunk of a query's stored results as JSON"""
+    try:
+        offset = max(int(request.GET.get('offset', 0)), 0)
+        limit = int(request.GET.get('limit', settings.RESULT_CHUNK_SIZE))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid offset or limit'}, status=400)
+    limit = min(max(limit, 1), settings.RESULT_CHUNK_SIZE)
+
+    # Slice the stored result in PostgreSQL so only the requested rows are sent and decoded
+    chunk = get_object_or_404(
+        Query.objects.filter(user=request.user).annotate(
+            chunk=RawSQL("jsonb_path_query_array(result, %s)", (f'$.data[{offset} to {offset + limit - 1}]',),
+                         output_field=models.JSONField()),
+            total=RawSQL("COALESCE(jsonb_array_length(result -> 'data'), 0)", (),
+                         output_field=models.IntegerField()),
+        ).values('chunk', 'total', 'result__success', 'result__error', 'result__columns'),
+        id=query_id
+    )
+
+    columns = chunk['result__columns'] or []
+    # Rows are sent as arrays in column order, which keeps chunks much smaller than dicts
+    rows = [[row.get(column) for column in columns] for row in chunk['chunk'] or []]
+
+    return JsonResponse({
+        'success': chunk['result__success'] or False,
+        'error': chunk['result__error'],
+        'columns': columns,
+        'rows': rows,
+        'offset': offset,
+        'total': chunk['total'],
+    })
+
 @login_required
 def export_csv(request, query_id):
     """Export query results as CSV"""
     query = get_object_or_404(Query, id=query_id, user=request.user)
     
-    db_service = DatabaseService()
-    csv_data = db_service.get_csv(query.sql_query)
+    db_service = get_database_service(query.data_source)
+    try:
+        with scheduler.admit('sql', request.user.id, priority=EXPORT):
+            csv_data = db_service.get_csv(query.sql_query)
+    except AdmissionRejected as e:
+        return _rejected(e)
     
     response = HttpResponse(csv_data, content_type='text/csv')
     response['Content-Disposition'] = f'attachment; filename="query_result_{query_id}.csv"'
     
     return response
 
+@login_required
+def export_query(request, query_id, fmt=None):
+    """Stream query results as CSV, Arrow IPC, Parquet or columnar JSON"""
+    query = get_object_or_404(Query, id=query_id, user=request.user)
+
+    # An explicit format in the URL or ?format= wins over the Accept header
+    fmt = negotiate_format(fmt or request.GET.get('format'), request.headers.get('Accept'))
+    if fmt is None:
+        return JsonResponse({
+            'success': False,
+            'error': f"Unsupported export format, choose one of: {', '.join(EXPORT_FORMATS)}"
+        }, status=406)
+
+    content_type, extension = EXPORT_FORMATS[fmt]
+    db_service = get_database_service(query.data_source)
+    try:
+        # Held until the stream is exhausted or the response is closed
+        ticket = scheduler.admit('sql', request.user.id, priority=EXPORT)
+    except AdmissionRejected as e:
+        return _rejected(e)
+
+    # Run the query before the response starts, so a failing statement is an
+    # error response rather than an empty or truncated download
+    batches = db_service.iter_batches(query.sql_query)
+    try:
+        first_batch = next(batches)
+    except Exception as e:
+        ticket.release()
+        logger.error(f"Error exporting query {query_id}: {str(e)}")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+    response = StreamingHttpResponse(
+        ReleasingIterator(stream_export(itertools.chain([first_batch], batches), fmt), ticket),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="query_result_{query_id}.{extension}"'
+    response['Vary'] = 'Accept'
+
+    return response
+
 @login_required
 def rerun_query(request, query_id):
     """Re-run a previous query"""
     query = get_object_or_404(Query, id=query_id, user=request.user)
     
-    db_service = DatabaseService()
-    result = db_service.execute_query(query.sql_query)
+    db_service = get_database_service(query.data_source)
+    try:
+        with scheduler.admit('sql', request.user.id, priority=RERUN):
+            result = db_service.execute_query(query.sql_query)
+    except AdmissionRejected as e:
+        return _rejected(e)
     
     # Update the query with new results
-    query.result_json = result
+    query.result = result
     query.save()
     
     return JsonResponse({
@@ -212,4 +361,12 @@ def rerun_query(request, query_id):
         'query_id': query.id,
         'sql': query.sql_query,
         'result': result
-    })
\ No newline at end of file
+    })
+
+@staff_member_required
+def metrics_view(request):
+    """Per-process service metrics as JSON"""
+    return JsonResponse({
+        **metrics.snapshot(),
+        'prepared_statements': prepared_service.stats(),
+    })
@@ -110,6 +110,65 @@ LOGOUT_REDIRECT_URL = '/'
 LLM_SERVICE_TYPE = os.environ.get('LLM_SERVICE_TYPE', 'huggingface')
 HUGGINGFACE_API_KEY = os.environ.get('HUGGINGFACE_API_KEY', '')
 HUGGINGFACE_MODEL = os.environ.get('HUGGINGFACE_MODEL', 'mistralai/Mistral-7B-Instruct-v0.2')
+# Seconds to wait for a response from the LLM API
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '60'))
+
+# Data source settings: each registered source gets its own small pool, released when idle
+DATA_SOURCE_POOL_SIZE = int(os.environ.get('DATA_SOURCE_POOL_SIZE', '5'))
+DATA_SOURCE_MAX_OVERFLOW = int(os.environ.get('DATA_SOURCE_MAX_OVERFLOW', '5'))
+DATA_SOURCE_IDLE_SECONDS = int(os.environ.get('DATA_SOURCE_IDLE_SECONDS', '600'))
+DATA_SOURCE_MAX_ACTIVE = int(os.environ.get('DATA_SOURCE_MAX_ACTIVE', '8'))
+
+# Result table settings: rows per JSON chunk fetched by the virtualized table
+RESULT_CHUNK_SIZE = int(os.environ.get('RESULT_CHUNK_SIZE', '500'))
+
+# Export Settings
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '5000'))
+
+# Value index: distinct values of text/enum columns with at most VALUE_INDEX_MAX_DISTINCT values,
+# used to resolve literals in questions and generated SQL
+VALUE_INDEX_ENABLED = os.environ.get('VALUE_INDEX_ENABLED', 'True') == 'True'
+VALUE_INDEX_MAX_DISTINCT = int(os.environ.get('VALUE_INDEX_MAX_DISTINCT', '500'))
+VALUE_INDEX_REFRESH_SECONDS = int(os.environ.get('VALUE_INDEX_REFRESH_SECONDS', '300'))
+VALUE_INDEX_MIN_SIMILARITY = float(os.environ.get('VALUE_INDEX_MIN_SIMILARITY', '0.5'))
+VALUE_INDEX_MAX_PHRASE_WORDS = int(os.environ.get('VALUE_INDEX_MAX_PHRASE_WORDS', '4'))
+VALUE_INDEX_MAX_HINTS = int(os.environ.get('VALUE_INDEX_MAX_HINTS', '10'))
+
+# Speculative SQL generation: up to SPECULATIVE_CANDIDATES LLM calls per question (the fan-out cap),
+# valid candidates raced against each other under SPECULATIVE_TIMEOUT_SECONDS. The race waits at most
+# SPECULATIVE_LLM_TIMEOUT_SECONDS for candidates to be generated; calls still running then are
+# abandoned and end within LLM_TIMEOUT_SECONDS
+SPECULATIVE_ENABLED = os.environ.get('SPECULATIVE_ENABLED', 'False') == 'True'
+SPECULATIVE_CANDIDATES = int(os.environ.get('SPECULATIVE_CANDIDATES', '3'))
+SPECULATIVE_TEMPERATURES = [float(t) for t in os.environ.get('SPECULATIVE_TEMPERATURES', '0.1,0.4,0.7').split(',')]
+SPECULATIVE_LLM_TIMEOUT_SECONDS = float(os.environ.get('SPECULATIVE_LLM_TIMEOUT_SECONDS', '30'))
+SPECULATIVE_TIMEOUT_SECONDS = float(os.environ.get('SPECULATIVE_TIMEOUT_SECONDS', '5'))
+# Worker threads shared by all speculative runs in a process (LLM calls and candidate executions)
+SPECULATIVE_MAX_WORKERS = int(os.environ.get('SPECULATIVE_MAX_WORKERS', '16'))
+
+# Prepared statements: generated SQL runs as a server-side prepared statement of its
+# parameterized shape, with up to PREPARED_STATEMENT_CACHE_SIZE statements per pooled connection
+PREPARED_STATEMENTS_ENABLED = os.environ.get('PREPARED_STATEMENTS_ENABLED', 'True') == 'True'
+PREPARED_STATEMENT_CACHE_SIZE = int(os.environ.get('PREPARED_STATEMENT_CACHE_SIZE', '64'))
+
+# Admission control: concurrency limits and bounded priority queues for LLM calls and SQL
+# execution, plus token buckets (questions per minute) on LLM calls. The limits below are for
+# the whole deployment; each process enforces its share, the limit divided by ADMISSION_WORKERS
+# (the number of worker processes, WEB_CONCURRENCY when unset). Queue sizes are per process.
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'True') == 'True'
+ADMISSION_WORKERS = int(os.environ.get('ADMISSION_WORKERS', os.environ.get('WEB_CONCURRENCY', '1')))
+ADMISSION_LLM_CONCURRENCY = int(os.environ.get('ADMISSION_LLM_CONCURRENCY', '4'))
+ADMISSION_SQL_CONCURRENCY = int(os.environ.get('ADMISSION_SQL_CONCURRENCY', '8'))
+ADMISSION_QUEUE_SIZE = int(os.environ.get('ADMISSION_QUEUE_SIZE', '32'))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_SECONDS', '10'))
+ADMISSION_LLM_USER_RATE = float(os.environ.get('ADMISSION_LLM_USER_RATE', '10'))
+ADMISSION_LLM_USER_BURST = float(os.environ.get('ADMISSION_LLM_USER_BURST', '5'))
+ADMISSION_LLM_GLOBAL_RATE = float(os.environ.get('ADMISSION_LLM_GLOBAL_RATE', '120'))
+ADMISSION_LLM_GLOBAL_BURST = float(os.environ.get('ADMISSION_LLM_GLOBAL_BURST', '20'))
+ADMISSION_MAX_TRACKED_USERS = int(os.environ.get('ADMISSION_MAX_TRACKED_USERS', '10000'))
+
+# Import pandas, SQLAlchemy, requests and pyarrow at startup instead of on first use
+PRELOAD_SERVICES = os.environ.get('PRELOAD_SERVICES', 'False') == 'True'
 
 # Logging configuration
 LOGGING = {